@@ -1,55 +1,49 @@
+import time
+
+_import_started = time.perf_counter()
+
 from flask import Flask, render_template
 from flask_login import LoginManager, current_user
-from models import db, User, Role
-
-# Blueprints
-from blueprints.cars import cars_bp
-from blueprints.parts import parts_bp, create_default_parts
-from blueprints.work_orders import work_bp
-from blueprints.users import users_bp
-from blueprints.auth import auth_bp, create_default_users
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db, Role
+from services import lookups, sqlite_profile, images, instrumentation, metrics, passwords, dashboard as summary
+from services.write_queue import writes
 
 # Load config class
 from config import Config
-from sqlalchemy import inspect, text
+import migrations
 
-app = Flask(__name__)
-app.config.from_object(Config)   # <-- FIXED: loads SQLALCHEMY_DATABASE_URI correctly
+_import_ms = (time.perf_counter() - _import_started) * 1000
 
-# Initialize database
-db.init_app(app)
-
-# Make Role available in ALL templates
-@app.context_processor
-def inject_role():
-    return dict(Role=Role)
-
-# Login manager
+# Login manager (bound to the app in create_app)
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
-login_manager.init_app(app)
-
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # cached per process; manage_users invalidates, the TTL covers other workers
+    return lookups.session_user(int(user_id))
+
+
+# Make Role available in ALL templates
+def inject_role():
+    return dict(Role=Role)
 
 
 # -------------------------
 # DASHBOARD ROUTES
 # -------------------------
 
-@app.route("/")
 def dashboard():
     if not current_user.is_authenticated:
         return render_template("landing.html")
 
     if current_user.role == Role.MANAGER:
-        return render_template("dashboard_manager.html")
+        return render_template("dashboard_manager.html", **summary.manager_summary())
 
     if current_user.role == Role.MECHANIC:
-        return render_template("dashboard_mechanic.html")
+        return render_template("dashboard_mechanic.html", **summary.mechanic_summary(current_user.id))
 
     if current_user.role == Role.CLIENT:
         return render_template("dashboard_client.html")
@@ -58,57 +52,92 @@ def dashboard():
 
 
 # -------------------------
-# REGISTER BLUEPRINTS
+# APPLICATION FACTORY
 # -------------------------
 
-app.register_blueprint(cars_bp)
-app.register_blueprint(parts_bp)
-app.register_blueprint(work_bp)
-app.register_blueprint(users_bp)
-app.register_blueprint(auth_bp)
+def create_app(config=Config):
+    """Build the Flask app.
+
+    ``config`` is a config class/object, or a dict of overrides applied on
+    top of ``Config`` (handy for scripts and benchmarks).
+    """
+    started = time.perf_counter()
+
+    app = Flask(__name__)
+    if isinstance(config, dict):
+        app.config.from_object(Config)
+        app.config.from_mapping(config)
+    else:
+        app.config.from_object(config)
+
+    # real client address/scheme behind TRUSTED_PROXIES reverse proxies (login throttle, logs)
+    proxies = app.config.get("TRUSTED_PROXIES", 0)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    # Initialize database and extensions
+    sqlite_profile.configure(app)
+    db.init_app(app)
+    with app.app_context():
+        sqlite_profile.install(app, db.engine)
+        instrumentation.install(app, db.engine)
+        metrics.init_app(app, db.engine)
+    lookups.init_app(app)
+    images.init_app(app)
+    writes.init_app(app)
+    passwords.init_app(app)
+    login_manager.init_app(app)
+    app.context_processor(inject_role)
+
+    # Blueprints are imported here so importing this module stays cheap
+    from blueprints.cars import cars_bp
+    from blueprints.parts import parts_bp
+    from blueprints.work_orders import work_bp
+    from blueprints.users import users_bp
+    from blueprints.auth import auth_bp
+    from blueprints.health import health_bp
+    from blueprints.search import search_bp
+    from blueprints.reports import reports_bp
+    from cli import register_commands
+
+    app.add_url_rule("/", "dashboard", dashboard)
+    app.register_blueprint(cars_bp)
+    app.register_blueprint(parts_bp)
+    app.register_blueprint(work_bp)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(reports_bp)
+    register_commands(app)
+
+    app.config["IMPORT_MS"] = round(_import_ms, 1)
+    app.config["STARTUP_MS"] = round((time.perf_counter() - started) * 1000, 1)
+    app.logger.info("app created in %.1f ms (imports %.1f ms)", app.config["STARTUP_MS"], _import_ms)
+    return app
+
+
+def ensure_schema_current(app):
+    """Refuse to serve against an outdated schema.
+
+    Schema changes are applied by `flask --app app upgrade-db`; serving
+    processes only compare version numbers, so preforked workers never
+    race each other on DDL.
+    """
+    with app.app_context():
+        version = migrations.current_version(db.engine)
+    if version < migrations.head():
+        raise SystemExit(
+            f"Database schema is at version {version}, expected {migrations.head()}. "
+            "Run `flask --app app upgrade-db` first."
+        )
 
 
 # -------------------------
-# RUN APP
+# RUN APP (development server)
 # -------------------------
 
 if __name__ == "__main__":
-    with app.app_context():
-        # Ensure all tables for new models exist
-        db.create_all()
-
-        # Create default users (if missing)
-        try:
-            create_default_users()
-        except Exception:
-            # don't fail startup if default user creation has issues
-            pass
-
-        # Add `image_filename` column to `car` table if missing (safe sqlite ALTER)
-        try:
-            inspector = inspect(db.engine)
-            cols = [c['name'] for c in inspector.get_columns('car')]
-            if 'image_filename' not in cols:
-                with db.engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE car ADD COLUMN image_filename VARCHAR(255)"))
-                    conn.commit()
-        except Exception:
-            # If anything goes wrong here we don't want to crash startup; show minimal feedback
-            pass
-        # Add `image_filename` column to `part` table if missing
-        try:
-            inspector = inspect(db.engine)
-            cols = [c['name'] for c in inspector.get_columns('part')]
-            if 'image_filename' not in cols:
-                with db.engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE part ADD COLUMN image_filename VARCHAR(255)"))
-                    conn.commit()
-        except Exception:
-            pass
-
-        # Create default parts if missing
-        try:
-            create_default_parts()
-        except Exception:
-            pass
+    app = create_app()
+    ensure_schema_current(app)
     app.run(debug=app.config.get("DEBUG", False))
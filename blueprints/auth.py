@@ -1,8 +1,10 @@
+import math
+
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_user, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from models import db, User, Role
+from services import passwords
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -15,11 +17,21 @@ def login():
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
 
+        # throttled before the user lookup and the (deliberately slow) hash
+        wait = passwords.login_wait(request.remote_addr, username)
+        if wait:
+            flash("Твърде много опити за вход. Опитайте отново след малко.", "danger")
+            return render_template("login.html"), 429, {"Retry-After": str(math.ceil(wait))}
+
         user = User.query.filter_by(username=username).first()
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not passwords.verify(user.password_hash, password):
             flash("Невалидно потребителско име или парола", "danger")
             return render_template("login.html")
 
+        if passwords.needs_rehash(user.password_hash):
+            user.password_hash = passwords.hash_password(password)
+            db.session.commit()
+
         login_user(user)
         return redirect(url_for("dashboard"))
 
@@ -36,7 +48,7 @@ def create_default_users():
     if not User.query.filter_by(username="admin").first():
         admin = User(
             username="admin",
-            password_hash=generate_password_hash("admin123"),
+            password_hash=passwords.hash_password("admin123"),
             role=Role.MANAGER,
         )
         db.session.add(admin)
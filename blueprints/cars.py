@@ -1,13 +1,32 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
-import os
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, current_app, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import joinedload
 
-from models import db, Car, Role, WorkOrder, User, WorkOrderPart
+from models import db, Car, Role, WorkOrder, User
+from services import images, archive, csv_io
 
 cars_bp = Blueprint("cars", __name__, url_prefix="/cars")
 
 
+def _prefix_range(column, prefix):
+    # `col >= 'abc' AND col < 'abd'` can use an index, LIKE 'abc%' cannot
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def _apply_search(query, q):
+    """Filter cars by VIN prefix, make/model prefix or exact year - all in SQL."""
+    conditions = [
+        _prefix_range(Car.vin, q.upper()),
+        _prefix_range(func.lower(Car.make), q.lower()),
+        _prefix_range(func.lower(Car.model), q.lower()),
+    ]
+    if q.isdigit() and len(q) == 4:
+        conditions.append(Car.year == int(q))
+    return query.filter(or_(*conditions))
+
+
 @cars_bp.route("/", methods=["GET", "POST"])
 @login_required
 def list_cars():
@@ -33,11 +52,15 @@ def list_cars():
             flash('Автомобил с този VIN вече съществува.', 'warning')
             return redirect(url_for('cars.list_cars'))
 
+        # link the car to a client account when the owner name is a username
+        owner = User.query.filter_by(username=owner_name).first() if owner_name else None
+
         car = Car(
             vin=vin,
             make=make,
             model=model,
             year=int(year) if year else None,
+            owner_id=owner.id if owner else None,
             owner_name=owner_name or current_user.username,
             owner_phone=owner_phone or 'N/A'
         )
@@ -48,41 +71,80 @@ def list_cars():
         if 'image' in request.files:
             f = request.files.get('image')
             if f and f.filename:
-                filename = secure_filename(f.filename)
-                # validate extension
-                if '.' in filename:
-                    ext = filename.rsplit('.', 1)[1].lower()
-                else:
-                    ext = ''
-                allowed = current_app.config.get('ALLOWED_IMAGE_EXTENSIONS', set())
-                if ext and ext in allowed:
-                    upload_root = current_app.config.get('UPLOAD_FOLDER')
-                    upload_folder = os.path.join(upload_root, 'cars', str(car.id))
-                    os.makedirs(upload_folder, exist_ok=True)
-                    save_path = os.path.join(upload_folder, filename)
-                    f.save(save_path)
-                    rel = os.path.join('uploads', 'cars', str(car.id), filename).replace('\\','/')
-                    car.image_filename = rel
+                try:
+                    car.image_filename = images.save_upload(f)
                     db.session.commit()
-                else:
+                    images.process_async(car.image_filename)
+                except images.ImageTooLarge:
+                    flash('Изображението е твърде голямо.', 'danger')
+                except images.UnsupportedImage:
                     flash('Неподдържан тип файл за изображение.', 'danger')
 
         flash('Автомобилът е добавен.', 'success')
         return redirect(url_for('cars.list_cars'))
 
-    # MANAGER: sees all cars
-    if current_user.role == Role.MANAGER:
-        cars = Car.query.order_by(Car.id.desc()).all()
-
-    # MECHANIC: sees all cars (you can change this if needed)
-    elif current_user.role == Role.MECHANIC:
-        cars = Car.query.order_by(Car.id.desc()).all()
+    query = Car.query
 
+    # MANAGER and MECHANIC: see all cars
     # CLIENT: sees only their own cars
-    else:
-        cars = Car.query.filter_by(owner_name=current_user.username).order_by(Car.id.desc()).all()
+    if current_user.role not in (Role.MANAGER, Role.MECHANIC):
+        query = query.filter_by(owner_id=current_user.id)
+
+    q = (request.args.get("q") or "").strip()
+    if q:
+        query = _apply_search(query, q)
+
+    # Keyset pagination: ?before=<id> continues below the last card shown
+    page_size = current_app.config.get("CARS_PAGE_SIZE", 24)
+    before = request.args.get("before", type=int)
+    if before:
+        query = query.filter(Car.id < before)
+
+    cars = query.order_by(Car.id.desc()).limit(page_size + 1).all()
+    next_cursor = None
+    if len(cars) > page_size:
+        cars = cars[:page_size]
+        next_cursor = cars[-1].id
+
+    return render_template(
+        "cars.html",
+        cars=cars,
+        q=q,
+        next_cursor=next_cursor,
+        is_first_page=not before,
+    )
+
 
-    return render_template("cars.html", cars=cars)
+@cars_bp.route("/import", methods=["POST"])
+@login_required
+def import_cars():
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри могат да добавят автомобили.", "danger")
+        return redirect(url_for("cars.list_cars"))
+
+    f = request.files.get("file")
+    if not f or not f.filename:
+        flash("Изберете CSV файл.", "warning")
+        return redirect(url_for("cars.list_cars"))
+    try:
+        result = csv_io.import_cars(csv_io.text_stream(f))
+    except csv_io.CsvFormatError as exc:
+        flash(f"Невалиден файл: {exc}", "danger")
+        return redirect(url_for("cars.list_cars"))
+    return render_template("import_report.html", title="автомобили", result=result, back_url=url_for("cars.list_cars"))
+
+
+@cars_bp.route("/export.csv")
+@login_required
+def export_cars():
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри могат да експортират автомобили.", "danger")
+        return redirect(url_for("cars.list_cars"))
+    return Response(
+        stream_with_context(csv_io.export_cars()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=cars.csv"},
+    )
 
 
 @cars_bp.route("/<int:car_id>")
@@ -91,18 +153,19 @@ def car_details(car_id):
     car = Car.query.get_or_404(car_id)
 
     # SECURITY: Clients can only view their own cars
-    if current_user.role == Role.CLIENT and car.owner_name != current_user.username:
+    if current_user.role == Role.CLIENT and car.owner_id != current_user.id:
         flash("Нямате право да виждате този автомобил.", "danger")
         return redirect(url_for("cars.list_cars"))
 
-    orders = WorkOrder.query.filter_by(car_id=car_id).all()
-    mechanics = User.query.filter_by(role=Role.MECHANIC).all()
+    # the mechanic column is loaded in the same query, not once per order
+    orders = WorkOrder.query.options(joinedload(WorkOrder.mechanic)).filter_by(car_id=car_id).all()
+    archived_orders = archive.car_history(car_id)
 
     return render_template(
         "car_details.html",
         car=car,
         orders=orders,
-        mechanics=mechanics
+        archived_orders=archived_orders,
     )
 
 
@@ -121,14 +184,9 @@ def delete_car(car_id):
         flash("Не може да изтриете този автомобил: има активни работни поръчки.", "danger")
         return redirect(url_for("cars.car_details", car_id=car.id))
 
-    # Delete related completed work orders and their used-parts entries to avoid FK integrity errors
-    completed_orders = WorkOrder.query.filter_by(car_id=car.id).all()
-    for order in completed_orders:
-        # delete WorkOrderPart entries for this order
-        WorkOrderPart.query.filter_by(work_order_id=order.id).delete()
-        db.session.delete(order)
-
-    db.session.delete(car)
+    # Delete the car with its completed work orders, their used parts and
+    # images as a few set-based statements (archived history is kept)
+    archive.delete_car_cascade(car.id)
     db.session.commit()
     flash("Автомобилът е изтрит.", "success")
     return redirect(url_for("cars.list_cars"))
@@ -0,0 +1,41 @@
+from flask import Blueprint, Response, abort, current_app, jsonify
+from sqlalchemy import text
+
+import migrations
+from models import db
+from services import metrics
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/healthz")
+def healthz():
+    # liveness: no database access, just proof the worker answers
+    return jsonify(
+        status="ok",
+        startup_ms=current_app.config.get("STARTUP_MS"),
+        import_ms=current_app.config.get("IMPORT_MS"),
+    )
+
+
+@health_bp.route("/readyz")
+def readyz():
+    # readiness: the database answers and the schema is current
+    try:
+        db.session.execute(text("SELECT 1"))
+        version = migrations.current_version(db.engine)
+    except Exception as exc:
+        return jsonify(status="unavailable", error=str(exc)), 503
+
+    if version < migrations.head():
+        return jsonify(status="outdated_schema", schema_version=version, expected=migrations.head()), 503
+    return jsonify(status="ok", schema_version=version)
+
+
+@health_bp.route("/metrics")
+def metrics_endpoint():
+    # for the Prometheus scraper; keep it off the public network
+    if not metrics.is_enabled():
+        abort(404)
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
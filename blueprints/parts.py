@@ -1,11 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, stream_with_context
 from flask_login import login_required, current_user
-import os
-from werkzeug.utils import secure_filename
 
-from models import db, Part, Role
+from models import db, Part, Role, MovementKind
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
-from models import WorkOrderPart
+from services import lookups, inventory, images, csv_io
 
 # parts_bp already defined above
 
@@ -21,10 +20,13 @@ def create_default_parts():
         if not Part.query.filter_by(part_number=pn).first():
             p = Part(part_number=pn, name=name, description=desc, quantity=10, unit_price=9.99, image_filename=img)
             db.session.add(p)
+            db.session.flush()
+            inventory.record(p.id, MovementKind.RECEIPT, p.quantity, note="initial stock")
     try:
         db.session.commit()
     except Exception:
         db.session.rollback()
+    lookups.invalidate_parts()
 
 parts_bp = Blueprint("parts", __name__, url_prefix="/parts")
 
@@ -61,32 +63,27 @@ def list_parts():
         )
         db.session.add(part)
         try:
+            db.session.flush()
+            if quantity:
+                inventory.record(part.id, MovementKind.RECEIPT, quantity, note="initial stock")
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
             flash("Част с този номер вече съществува.", "danger")
             return redirect(url_for("parts.list_parts"))
+        lookups.invalidate_parts()
 
         # handle optional image upload
         if 'image' in request.files:
             f = request.files.get('image')
             if f and f.filename:
-                filename = secure_filename(f.filename)
-                if '.' in filename:
-                    ext = filename.rsplit('.', 1)[1].lower()
-                else:
-                    ext = ''
-                allowed = current_app.config.get('ALLOWED_IMAGE_EXTENSIONS', set())
-                if ext and ext in allowed:
-                    upload_root = current_app.config.get('UPLOAD_FOLDER')
-                    upload_folder = os.path.join(upload_root, 'parts', str(part.id))
-                    os.makedirs(upload_folder, exist_ok=True)
-                    save_path = os.path.join(upload_folder, filename)
-                    f.save(save_path)
-                    rel = os.path.join('uploads', 'parts', str(part.id), filename).replace('\\','/')
-                    part.image_filename = rel
+                try:
+                    part.image_filename = images.save_upload(f)
                     db.session.commit()
-                else:
+                    images.process_async(part.image_filename)
+                except images.ImageTooLarge:
+                    flash('Изображението е твърде голямо.', 'danger')
+                except images.UnsupportedImage:
                     flash('Неподдържан тип файл за изображение.', 'danger')
 
         flash("Частта е добавена.", "success")
@@ -96,11 +93,91 @@ def list_parts():
     return render_template("parts.html", parts=parts)
 
 
+@parts_bp.route("/import", methods=["POST"])
+@login_required
+def import_parts():
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри могат да управляват инвентара.", "danger")
+        return redirect(url_for("parts.list_parts"))
+
+    f = request.files.get("file")
+    if not f or not f.filename:
+        flash("Изберете CSV файл.", "warning")
+        return redirect(url_for("parts.list_parts"))
+    try:
+        result = csv_io.import_parts(csv_io.text_stream(f))
+    except csv_io.CsvFormatError as exc:
+        flash(f"Невалиден файл: {exc}", "danger")
+        return redirect(url_for("parts.list_parts"))
+    return render_template("import_report.html", title="части", result=result, back_url=url_for("parts.list_parts"))
+
+
+@parts_bp.route("/export.csv")
+@login_required
+def export_parts():
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри могат да управляват инвентара.", "danger")
+        return redirect(url_for("parts.list_parts"))
+    return Response(
+        stream_with_context(csv_io.export_parts()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=parts.csv"},
+    )
+
+
 @parts_bp.route('/<int:part_id>')
 @login_required
 def part_details(part_id):
     part = Part.query.get_or_404(part_id)
-    return render_template('part_details.html', part=part)
+    history = inventory.stock_history(part.id) if current_user.role == Role.MANAGER else []
+    return render_template('part_details.html', part=part, history=history)
+
+
+@parts_bp.route("/<int:part_id>/restock", methods=["POST"])
+@login_required
+def restock_part(part_id):
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри могат да управляват инвентара.", "danger")
+        return redirect(url_for("parts.list_parts"))
+
+    part = Part.query.get_or_404(part_id)
+    try:
+        quantity = int(request.form.get("quantity") or 0)
+    except (ValueError, TypeError):
+        quantity = 0
+    if quantity <= 0:
+        flash("Въведете положително количество.", "warning")
+        return redirect(url_for("parts.part_details", part_id=part.id))
+
+    inventory.receive(part.id, quantity, note=(request.form.get("note") or "").strip() or None)
+    db.session.commit()
+    lookups.invalidate_parts()
+    flash("Доставката е записана.", "success")
+    return redirect(url_for("parts.part_details", part_id=part.id))
+
+
+@parts_bp.route("/<int:part_id>/adjust", methods=["POST"])
+@login_required
+def adjust_part(part_id):
+    """Stocktake: set the quantity to what was physically counted."""
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри могат да управляват инвентара.", "danger")
+        return redirect(url_for("parts.list_parts"))
+
+    part = Part.query.get_or_404(part_id)
+    try:
+        counted = int(request.form.get("counted"))
+    except (ValueError, TypeError):
+        counted = -1
+    if counted < 0:
+        flash("Въведете преброеното количество.", "warning")
+        return redirect(url_for("parts.part_details", part_id=part.id))
+
+    delta = inventory.adjust_to(part.id, counted, note=(request.form.get("note") or "").strip() or "stocktake")
+    db.session.commit()
+    lookups.invalidate_parts()
+    flash(f"Наличността е коригирана ({delta:+d}).", "success")
+    return redirect(url_for("parts.part_details", part_id=part.id))
 
 
 @parts_bp.route("/delete/<int:part_id>", methods=["POST"])
@@ -112,13 +189,17 @@ def delete_part(part_id):
 
     part = Part.query.get_or_404(part_id)
 
-    # Prevent deletion if part was used in any work order
-    used = WorkOrderPart.query.filter_by(part_id=part.id).first()
+    # Prevent deletion if part was used in any work order, archived ones included
+    used = db.session.execute(
+        text("SELECT 1 FROM work_order_part_history WHERE part_id = :part_id LIMIT 1"), {"part_id": part.id}
+    ).first()
     if used:
         flash("Не може да изтриете частта — вече е използвана в работни поръчки.", "danger")
         return redirect(url_for("parts.list_parts"))
 
+    inventory.retire_part(part.id)
     db.session.delete(part)
     db.session.commit()
+    lookups.invalidate_parts()
     flash("Частта е изтрита.", "success")
     return redirect(url_for("parts.list_parts"))
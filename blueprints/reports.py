@@ -0,0 +1,49 @@
+from datetime import date
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_login import login_required, current_user
+
+from models import Role
+from services import reporting
+
+reports_bp = Blueprint("reports", __name__, url_prefix="/reports")
+
+
+def _date_range():
+    start, end = reporting.default_range()
+    try:
+        if request.args.get("start"):
+            start = date.fromisoformat(request.args["start"])
+        if request.args.get("end"):
+            end = date.fromisoformat(request.args["end"])
+    except ValueError:
+        flash("Невалидна дата — показани са последните 30 дни.", "warning")
+        return reporting.default_range()
+    return (end, start) if start > end else (start, end)
+
+
+@reports_bp.route("/")
+@login_required
+def overview():
+    if current_user.role != Role.MANAGER:
+        flash("Само мениджъри имат достъп до отчетите.", "danger")
+        return redirect(url_for("dashboard"))
+
+    start, end = _date_range()
+    units, revenue = reporting.usage_totals(start, end)
+    age_buckets, open_total, oldest_open = reporting.open_order_age()
+    return render_template(
+        "reports.html",
+        start=start,
+        end=end,
+        units=units,
+        revenue=revenue,
+        parts=reporting.part_usage(start, end),
+        series=reporting.revenue_series(start, end),
+        mechanics=reporting.mechanic_completions(start, end),
+        days=(end - start).days + 1,
+        monthly=(end - start).days >= reporting.DAILY_SERIES_MAX_DAYS,
+        age_buckets=age_buckets,
+        open_total=open_total,
+        oldest_open=oldest_open,
+    )
@@ -0,0 +1,25 @@
+from flask import Blueprint, render_template, request, current_app
+from flask_login import login_required, current_user
+
+from services import search
+
+search_bp = Blueprint("search", __name__)
+
+
+@search_bp.route("/search")
+@login_required
+def global_search():
+    q = (request.args.get("q") or "").strip()
+    page_size = current_app.config.get("SEARCH_PAGE_SIZE", 20)
+    # ranked results page by offset; deep pages are not useful, so cap them
+    max_pages = current_app.config.get("SEARCH_MAX_PAGES", 20)
+    page = min(max(request.args.get("page", 1, type=int), 1), max_pages)
+
+    results, has_next = search.search(q, current_user, page=page, page_size=page_size)
+    return render_template(
+        "search.html",
+        q=q,
+        results=results,
+        page=page,
+        has_next=has_next and page < max_pages,
+    )
@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash
 
 from models import db, User, Role
+from services import lookups, passwords
 
 users_bp = Blueprint("users", __name__, url_prefix="/users")
 
@@ -24,11 +24,12 @@ def manage_users():
 
         user = User(
             username=username,
-            password_hash=generate_password_hash(password),
+            password_hash=passwords.hash_password(password),
             role=role
         )
         db.session.add(user)
         db.session.commit()
+        lookups.invalidate_users()
         flash("Потребителят е създаден успешно.", "success")
         return redirect(url_for("users.manage_users"))
 
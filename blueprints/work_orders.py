@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import or_
-import os
-from werkzeug.utils import secure_filename
+from sqlalchemy import or_, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
-from models import db, WorkOrder, WorkOrderPart, Car, Part, User, Role, WorkOrderImage
+from models import db, WorkOrder, Car, Role, WorkOrderImage, utcnow
+from services import lookups, inventory, images, idempotency, reporting
+from services.write_queue import writes, WriteTimeout
 
 work_bp = Blueprint("work_orders", __name__, url_prefix="/work-orders")
 
@@ -21,6 +23,12 @@ def list_work_orders():
             flash("Само клиенти могат да създават работни поръчки.", "danger")
             return redirect(url_for("work_orders.list_work_orders"))
 
+        # A retried/double-submitted form carries the same key: no-op
+        idempotency_key = (request.form.get("idempotency_key") or "").strip()[:64] or None
+        if idempotency_key and idempotency.find(idempotency_key, current_user.id):
+            flash("Тази работна поръчка вече е създадена.", "info")
+            return redirect(url_for("work_orders.list_work_orders"))
+
         # Get car details typed by client
         make = request.form.get("make")
         model = request.form.get("model")
@@ -28,8 +36,22 @@ def list_work_orders():
         vin = request.form.get("vin")
         description = request.form.get("description")
 
-        # Create a new car automatically
-       # Check if VIN already exists
+        # Store uploaded images first (field name: images). Paths are
+        # content-addressed, so they do not depend on the order id and the
+        # database work below can be a single transaction.
+        saved = []
+        files = request.files.getlist('images') if 'images' in request.files else []
+        for f in files:
+            if f and f.filename:
+                try:
+                    # content-addressed path under static/ (see services/images.py)
+                    saved.append(images.save_upload(f))
+                except images.ImageTooLarge:
+                    flash('Изображението е твърде голямо — пропуснат файл.', 'warning')
+                except images.UnsupportedImage:
+                    flash('Неподдържан тип файл за изображение — пропуснат файл.', 'warning')
+
+        # Check if VIN already exists, otherwise create the car
         existing_car = None
         if vin:
             existing_car = Car.query.filter_by(vin=vin).first()
@@ -42,11 +64,12 @@ def list_work_orders():
                 make=make,
                 model=model,
                 year=int(year) if year else None,
+                owner_id=current_user.id,
                 owner_name=current_user.username,
                 owner_phone="N/A"
             )
             db.session.add(car)
-            db.session.commit()
+            db.session.flush()
 
         # create the work order
         order = WorkOrder(
@@ -56,37 +79,35 @@ def list_work_orders():
             status='open'
         )
         db.session.add(order)
-        db.session.commit()
-
-        # Handle uploaded images (field name: images)
-        upload_root = current_app.config.get('UPLOAD_FOLDER')
-        order_folder = os.path.join(upload_root, 'orders', str(order.id))
-        os.makedirs(order_folder, exist_ok=True)
+        db.session.flush()
+        reporting.order_created(order)
+
+        if saved:
+            # one multi-row INSERT for all images
+            db.session.execute(
+                insert(WorkOrderImage),
+                [{"work_order_id": order.id, "filename": rel_path} for rel_path in saved],
+            )
+            # if car has no image, set the car image to the first one
+            if not car.image_filename:
+                car.image_filename = saved[0]
 
-        files = request.files.getlist('images') if 'images' in request.files else []
-        allowed = current_app.config.get('ALLOWED_IMAGE_EXTENSIONS', set())
-        for f in files:
-            if f and f.filename:
-                filename = secure_filename(f.filename)
-                if '.' in filename:
-                    ext = filename.rsplit('.', 1)[1].lower()
-                else:
-                    ext = ''
-                if ext and ext in allowed:
-                    save_path = os.path.join(order_folder, filename)
-                    f.save(save_path)
-                    # store relative path from static/
-                    rel_path = os.path.join('uploads', 'orders', str(order.id), filename).replace('\\','/')
-                    img = WorkOrderImage(work_order_id=order.id, filename=rel_path)
-                    db.session.add(img)
-
-                    # if car has no image, set the car image to this one
-                    if not car.image_filename:
-                        car.image_filename = rel_path
-                else:
-                    flash('Неподдържан тип файл за изображение — пропуснат файл.', 'warning')
-        db.session.commit()
+        if idempotency_key:
+            idempotency.remember(idempotency_key, current_user.id, order.id)
 
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # a concurrent submit with the same key won the race
+            if idempotency_key and idempotency.find(idempotency_key, current_user.id):
+                flash("Тази работна поръчка вече е създадена.", "info")
+                return redirect(url_for("work_orders.list_work_orders"))
+            raise
+
+        # thumbnails are made after the response, by the image pool
+        for rel_path in saved:
+            images.process_async(rel_path)
 
         flash("Работната поръчка е създадена успешно.", "success")
         return redirect(url_for("work_orders.list_work_orders"))
@@ -94,7 +115,13 @@ def list_work_orders():
     # -----------------------------
     # LIST WORK ORDERS BASED ON ROLE
     # -----------------------------
-    query = WorkOrder.query
+    # car/client/mechanic are joined into the same SELECT so rendering the
+    # rows does not trigger a lazy load per order
+    query = WorkOrder.query.options(
+        joinedload(WorkOrder.car),
+        joinedload(WorkOrder.client),
+        joinedload(WorkOrder.mechanic),
+    )
 
     if current_user.role == Role.MECHANIC:
         # Mechanics see:
@@ -110,18 +137,64 @@ def list_work_orders():
     elif current_user.role == Role.CLIENT:
         query = query.filter_by(client_id=current_user.id)
 
-    orders = query.order_by(WorkOrder.id.desc()).all()
-    mechanics = User.query.filter_by(role=Role.MECHANIC).all()
-    parts = Part.query.all()
+    # Optional filters (?status=...&mechanic=<id>|none)
+    status_filter = (request.args.get("status") or "").strip()
+    if status_filter:
+        query = query.filter(WorkOrder.status == status_filter)
+
+    mechanic_filter = (request.args.get("mechanic") or "").strip()
+    if mechanic_filter == "none":
+        query = query.filter(WorkOrder.mechanic_id.is_(None))
+    elif mechanic_filter.isdigit():
+        query = query.filter(WorkOrder.mechanic_id == int(mechanic_filter))
+
+    # Keyset pagination: ?before=<id> continues below the last id shown
+    page_size = current_app.config.get("WORK_ORDERS_PAGE_SIZE", 50)
+    before = request.args.get("before", type=int)
+    if before:
+        query = query.filter(WorkOrder.id < before)
+
+    orders = query.order_by(WorkOrder.id.desc()).limit(page_size + 1).all()
+    next_cursor = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_cursor = orders[-1].id
 
     return render_template(
         "work_orders.html",
         orders=orders,
-        mechanics=mechanics,
-        parts=parts,
+        mechanics=lookups.mechanic_options(),
+        next_cursor=next_cursor,
+        is_first_page=not before,
+        status_filter=status_filter,
+        mechanic_filter=mechanic_filter,
+        idempotency_key=idempotency.new_key() if current_user.role == Role.CLIENT else None,
     )
 
 
+# Write jobs for the write queue: they run in the writer's session, so they
+# take ids rather than objects loaded by the request.
+PENDING_WRITE_MESSAGE = "Промяната е приета, но още не е записана — проверете след малко."
+
+def _assign_mechanic(order_id, mechanic_id):
+    order = db.session.get(WorkOrder, order_id)
+    before = reporting.order_state(order)
+    order.mechanic_id = mechanic_id
+    order.status = "in_progress"
+    reporting.order_changed(before, order)
+
+
+def _set_status(order_id, status):
+    order = db.session.get(WorkOrder, order_id)
+    before = reporting.order_state(order)
+    if status == "completed" and order.status != "completed":
+        order.completed_at = utcnow()
+    elif status != "completed":
+        order.completed_at = None
+    order.status = status
+    reporting.order_changed(before, order)
+
+
 # -----------------------------
 # MANAGER ASSIGNS MECHANIC
 # -----------------------------
@@ -134,9 +207,12 @@ def assign_mechanic(order_id):
 
     mechanic_id = int(request.form.get("mechanic_id"))
     order = WorkOrder.query.get_or_404(order_id)
-    order.mechanic_id = mechanic_id
-    order.status = "in_progress"
-    db.session.commit()
+    try:
+        writes.run(_assign_mechanic, order.id, mechanic_id)
+    except WriteTimeout:
+        # still queued: it may yet be saved, so this is not an error
+        flash(PENDING_WRITE_MESSAGE, "warning")
+        return redirect(url_for("work_orders.list_work_orders"))
 
     flash("Механикът е назначен успешно.", "success")
     return redirect(url_for("work_orders.list_work_orders"))
@@ -154,9 +230,11 @@ def update_status(order_id):
 
     new_status = request.form.get("status")
     order = WorkOrder.query.get_or_404(order_id)
-
-    order.status = new_status
-    db.session.commit()
+    try:
+        writes.run(_set_status, order.id, new_status)
+    except WriteTimeout:
+        flash(PENDING_WRITE_MESSAGE, "warning")
+        return redirect(url_for("work_orders.list_work_orders"))
 
     flash("Статусът е обновен.", "success")
     return redirect(url_for("work_orders.list_work_orders"))
@@ -173,6 +251,7 @@ def complete_order(order_id):
         return redirect(url_for("work_orders.list_work_orders"))
 
     order = WorkOrder.query.get_or_404(order_id)
+    before = reporting.order_state(order)
 
     # Ensure mechanic is assigned (or assign to current mechanic)
     if order.mechanic_id is None:
@@ -189,21 +268,19 @@ def complete_order(order_id):
 
     # Deduct parts from inventory if provided
     if part_id and quantity_used > 0:
-        part = Part.query.get(int(part_id))
-        if part and part.quantity >= quantity_used:
-            part.quantity -= quantity_used
-            wop = WorkOrderPart(
-                work_order_id=order.id,
-                part_id=part.id,
-                quantity_used=quantity_used,
-            )
-            db.session.add(wop)
-        else:
+        try:
+            inventory.consume(order.id, int(part_id), quantity_used)
+        except (inventory.InsufficientStock, ValueError):
+            db.session.rollback()
             flash("Няма достатъчно наличност за тази част.", "danger")
             return redirect(url_for("work_orders.view_order", order_id=order.id))
 
     order.status = "completed"
+    order.completed_at = utcnow()
+    reporting.order_changed(before, order)
     db.session.commit()
+    if part_id and quantity_used > 0:
+        lookups.invalidate_parts()
 
     flash("Работната поръчка е завършена.", "success")
     return redirect(url_for("work_orders.view_order", order_id=order.id))
@@ -216,8 +293,6 @@ def view_order(order_id):
     client = order.client
     mechanic = order.mechanic
     parts_used = order.parts_used  # WorkOrderPart entries (backref from WorkOrderPart)
-    mechanics = User.query.filter_by(role=Role.MECHANIC).all()
-    parts = Part.query.all()
 
     return render_template(
         "work_order_details.html",
@@ -226,8 +301,6 @@ def view_order(order_id):
         client=client,
         mechanic=mechanic,
         parts_used=parts_used,
-        mechanics=mechanics,
-        parts=parts,
     )
 
 
@@ -259,23 +332,67 @@ def use_part(order_id):
         flash("Изберете част и въведете положително количество.", "warning")
         return redirect(url_for("work_orders.view_order", order_id=order.id))
 
-    part = Part.query.get(part_id)
-    if not part or part.quantity < quantity_used:
+    # Deduct and record (conditional UPDATE, see services/inventory.py)
+    try:
+        inventory.consume(order.id, part_id, quantity_used)
+    except inventory.InsufficientStock:
+        db.session.rollback()
         flash("Няма достатъчно наличност за тази част.", "danger")
         return redirect(url_for("work_orders.view_order", order_id=order.id))
 
-    # Deduct and record
-    part.quantity -= quantity_used
-    wop = WorkOrderPart(
-        work_order_id=order.id,
-        part_id=part.id,
-        quantity_used=quantity_used,
-    )
-    db.session.add(wop)
     if order.status == 'open':
         order.status = 'in_progress'
 
     db.session.commit()
+    lookups.invalidate_parts()
     flash("Частта е маркирана като използвана.", "success")
     return redirect(url_for("work_orders.view_order", order_id=order.id))
 
+
+@work_bp.route("/use_parts/<int:order_id>", methods=["POST"])
+@login_required
+def use_parts(order_id):
+    """Book several parts at once; either every line is booked or none."""
+    if current_user.role != Role.MECHANIC:
+        flash("Само механици могат да използват части.", "danger")
+        return redirect(url_for("work_orders.list_work_orders"))
+
+    order = WorkOrder.query.get_or_404(order_id)
+
+    if order.mechanic_id != current_user.id:
+        flash("Само назначеният механик може да използва части.", "danger")
+        return redirect(url_for("work_orders.view_order", order_id=order.id))
+
+    lines = []
+    for raw_part, raw_qty in zip(request.form.getlist("part_id"), request.form.getlist("quantity_used")):
+        if not raw_part and not raw_qty:
+            continue  # blank row in the form
+        try:
+            part_id, quantity_used = int(raw_part), int(raw_qty)
+        except (ValueError, TypeError):
+            flash("Невалидно количество.", "danger")
+            return redirect(url_for("work_orders.view_order", order_id=order.id))
+        if part_id <= 0 or quantity_used <= 0:
+            flash("Изберете част и въведете положително количество.", "warning")
+            return redirect(url_for("work_orders.view_order", order_id=order.id))
+        lines.append((part_id, quantity_used))
+
+    if not lines:
+        flash("Изберете поне една част.", "warning")
+        return redirect(url_for("work_orders.view_order", order_id=order.id))
+
+    try:
+        inventory.consume_many(order.id, lines)
+    except inventory.InsufficientStock:
+        db.session.rollback()
+        flash("Няма достатъчно наличност за някоя от частите — нищо не е записано.", "danger")
+        return redirect(url_for("work_orders.view_order", order_id=order.id))
+
+    if order.status == 'open':
+        order.status = 'in_progress'
+
+    db.session.commit()
+    lookups.invalidate_parts()
+    flash(f"Маркирани като използвани: {len(lines)} реда.", "success")
+    return redirect(url_for("work_orders.view_order", order_id=order.id))
+
@@ -0,0 +1,113 @@
+"""One-off maintenance commands (`flask --app app <command>`)."""
+import click
+
+import migrations
+from models import db
+
+
+def register_commands(app):
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Apply pending schema migrations."""
+        applied = migrations.upgrade(db.engine, log=click.echo)
+        click.echo(f"schema version {migrations.current_version(db.engine)} ({len(applied)} applied)")
+
+    @app.cli.command("seed")
+    def seed_command():
+        """Create the default manager account and starter parts if missing."""
+        from blueprints.auth import create_default_users
+        from blueprints.parts import create_default_parts
+
+        create_default_users()
+        create_default_parts()
+        click.echo("default users and parts are in place")
+
+    @app.cli.command("build-image-variants")
+    @click.option("--overwrite", is_flag=True, help="Regenerate variants that already exist.")
+    def build_image_variants_command(overwrite):
+        """Generate missing thumbnails/WebP variants for every referenced upload."""
+        from models import Car, Part, WorkOrderImage
+        from services import images
+
+        paths = set()
+        for column in (Car.image_filename, Part.image_filename, WorkOrderImage.filename):
+            paths.update(p for (p,) in db.session.query(column).filter(column.like("uploads/%")).distinct())
+        written = sum(images.generate_variants(p, overwrite=overwrite) for p in sorted(paths))
+        click.echo(f"{len(paths)} image(s) checked, {written} variant(s) written")
+
+    @app.cli.command("prune-idempotency-keys")
+    def prune_idempotency_keys_command():
+        """Delete form idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS."""
+        from services import idempotency
+
+        removed = idempotency.prune(app.config["IDEMPOTENCY_KEY_TTL_HOURS"])
+        click.echo(f"{removed} key(s) removed")
+
+    @app.cli.command("archive-orders")
+    @click.option("--days", default=lambda: app.config["ARCHIVE_AFTER_DAYS"], type=int,
+                  help="Archive orders completed more than this many days ago.")
+    @click.option("--batch-size", default=500, show_default=True)
+    def archive_orders_command(days, batch_size):
+        """Move old completed work orders (with parts and images) to the archive tables."""
+        from services import archive
+
+        moved = archive.archive_completed(days, batch_size=batch_size, log=click.echo)
+        click.echo(f"{moved} order(s) archived")
+
+    @app.cli.command("reconcile-stock")
+    @click.option("--fix", is_flag=True, help="Book reconciliation adjustments and rebuild rollups.")
+    def reconcile_stock_command(fix):
+        """Check Part.quantity against the stock ledger and daily rollup (run from cron)."""
+        from services import inventory
+
+        mismatches = inventory.reconcile(fix=fix)
+        for part_id, on_hand, ledger_total, rollup_total in mismatches:
+            click.echo(f"part {part_id}: on hand {on_hand}, ledger {ledger_total}, rollup {rollup_total}")
+        click.echo(f"{len(mismatches)} mismatched part(s){' fixed' if fix and mismatches else ''}")
+
+    @app.cli.command("backfill-reports")
+    def backfill_reports_command():
+        """Rebuild the reporting rollups from work orders and the stock ledger."""
+        from services import reporting
+
+        for table, rows in reporting.rebuild().items():
+            click.echo(f"{table}: {rows} row(s)")
+
+    @app.cli.command("gc-uploads")
+    @click.option("--delete", is_flag=True, help="Remove orphans (default: only report them).")
+    @click.option("--batch-size", default=500, show_default=True)
+    @click.option("--max-files", type=int, default=None,
+                  help="Stop after this many files; the next run resumes from the saved cursor.")
+    @click.option("--pause", default=0.05, show_default=True, help="Seconds to sleep between batches.")
+    @click.option("--grace-minutes", default=lambda: app.config["UPLOAD_GC_GRACE_MINUTES"], type=int,
+                  help="Ignore files modified more recently than this.")
+    @click.option("--restart", is_flag=True, help="Forget the saved cursor and start from the top.")
+    def gc_uploads_command(delete, batch_size, max_files, pause, grace_minutes, restart):
+        """Find (and with --delete remove) upload files no row references."""
+        from services import upload_gc
+
+        summary = upload_gc.collect(
+            delete=delete, batch_size=batch_size, max_files=max_files, pause=pause,
+            grace_seconds=grace_minutes * 60, restart=restart, log=click.echo,
+        )
+        verb = "deleted" if delete else "reclaimable"
+        click.echo(f"{summary['orphans']} orphan(s), {summary['orphan_bytes']} byte(s) {verb}"
+                   f"{'' if summary['finished'] else ' so far (run again to continue)'}")
+
+    @app.cli.command("import-csv")
+    @click.argument("kind", type=click.Choice(["parts", "cars"]))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", default=1000, show_default=True)
+    def import_csv_command(kind, path, batch_size):
+        """Upsert parts (by part_number) or cars (by VIN) from a CSV file."""
+        from services import csv_io
+
+        importer = csv_io.import_parts if kind == "parts" else csv_io.import_cars
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            try:
+                result = importer(fh, batch_size=batch_size)
+            except csv_io.CsvFormatError as exc:
+                raise click.ClickException(str(exc))
+        for line, message in result.errors:
+            click.echo(f"line {line}: {message}")
+        click.echo(f"{result.created} created, {result.updated} updated, {result.skipped} skipped")
@@ -11,7 +11,89 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # Central upload folder (relative to project)
     UPLOAD_FOLDER = os.path.join(BASE_DIR, "static", "uploads")
-    # Max upload size (5 MB)
-    MAX_CONTENT_LENGTH = 5 * 1024 * 1024
+    # Max request body (25 MB, e.g. several photos in one work order)
+    MAX_CONTENT_LENGTH = 25 * 1024 * 1024
+    # Uploads being received (and rejected ones) are written here, outside
+    # static/ so they are never served. Must be on the same filesystem as
+    # UPLOAD_FOLDER: finished uploads are renamed into place.
+    UPLOAD_TMP_FOLDER = os.environ.get("UPLOAD_TMP_FOLDER") or os.path.join(BASE_DIR, "upload_tmp")
+    # Max size of a single uploaded image (5 MB), enforced while it streams in
+    MAX_IMAGE_BYTES = int(os.environ.get("MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
     # Allowed image extensions for uploads
     ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+    # Derived WebP sizes (name -> bounding box) shown on list pages; needs Pillow
+    IMAGE_VARIANTS = {"card": (640, 400), "thumb": (200, 200)}
+    IMAGE_WEBP_QUALITY = int(os.environ.get("IMAGE_WEBP_QUALITY", "80"))
+    # Completed work orders older than this are moved to the archive tables
+    # by `flask --app app archive-orders`
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))
+    # How long form idempotency keys are kept (prune-idempotency-keys)
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS", "48"))
+    # Threads per process generating variants after the response (0 = inline)
+    IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+    # gc-uploads: resume cursor (kept outside static/), and how old an
+    # unreferenced file must be before it counts as an orphan
+    UPLOAD_GC_STATE_FILE = os.environ.get("UPLOAD_GC_STATE_FILE") or os.path.join(BASE_DIR, "upload_gc_state.json")
+    UPLOAD_GC_GRACE_MINUTES = int(os.environ.get("UPLOAD_GC_GRACE_MINUTES", "60"))
+    # Work orders listing: rows per page (keyset pagination on WorkOrder.id)
+    WORK_ORDERS_PAGE_SIZE = int(os.environ.get("WORK_ORDERS_PAGE_SIZE", "50"))
+    # Cars catalog: cards per page (keyset pagination on Car.id)
+    CARS_PAGE_SIZE = int(os.environ.get("CARS_PAGE_SIZE", "24"))
+    # Per-request SQL instrumentation (services/instrumentation.py): off by
+    # default; with it on, SAMPLE_RATE of requests get a Server-Timing header
+    # and are logged when slower than SLOW_REQUEST_MS or showing N+1 queries
+    SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "0") == "1"
+    SQL_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("SQL_INSTRUMENTATION_SAMPLE_RATE", "0.1"))
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", "500"))
+    NPLUSONE_THRESHOLD = int(os.environ.get("NPLUSONE_THRESHOLD", "5"))
+    SLOW_REQUEST_LOG = os.environ.get("SLOW_REQUEST_LOG")
+    # Prometheus metrics at /metrics (services/metrics.py, needs prometheus_client).
+    # With several workers also set PROMETHEUS_MULTIPROC_DIR (see README).
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+    # Global search (/search): ranked results per page, and how deep it pages
+    SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", "20"))
+    SEARCH_MAX_PAGES = int(os.environ.get("SEARCH_MAX_PAGES", "20"))
+    # In-process cache for parts/mechanics lookups (see services/lookups.py).
+    # Writers invalidate it explicitly; the TTL bounds staleness in other workers.
+    LOOKUP_CACHE_MAX_ENTRIES = int(os.environ.get("LOOKUP_CACHE_MAX_ENTRIES", "256"))
+    LOOKUP_CACHE_TTL = int(os.environ.get("LOOKUP_CACHE_TTL", "30"))
+    # Users behind login sessions, cached so requests do not load them again.
+    # Changes made here apply at once; other workers see them within the TTL.
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "1024"))
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "60"))
+    # Werkzeug hash method for passwords, e.g. "scrypt", "scrypt:16384:8:1" or
+    # "pbkdf2:sha256:260000". Existing hashes are upgraded at the next login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    # Login attempts per client IP and per username (token buckets, per worker):
+    # BURST attempts at once, refilled at PER_MINUTE. Excess attempts get 429.
+    LOGIN_THROTTLE = os.environ.get("LOGIN_THROTTLE", "1") == "1"
+    LOGIN_IP_BURST = int(os.environ.get("LOGIN_IP_BURST", "20"))
+    LOGIN_IP_PER_MINUTE = float(os.environ.get("LOGIN_IP_PER_MINUTE", "10"))
+    LOGIN_USER_BURST = int(os.environ.get("LOGIN_USER_BURST", "5"))
+    LOGIN_USER_PER_MINUTE = float(os.environ.get("LOGIN_USER_PER_MINUTE", "5"))
+    # Number of reverse proxies in front of the app whose X-Forwarded-For /
+    # X-Forwarded-Proto headers are trusted (Werkzeug ProxyFix). 0 = none: the
+    # client address is the socket peer. Behind one nginx, set 1; never set it
+    # higher than the real number of proxies, or clients can spoof their IP.
+    TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "0"))
+    # Parts at or below this quantity count as low stock on the manager dashboard
+    LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "5"))
+
+    # Opt-in SQLite profile for multiple workers (see services/sqlite_profile.py)
+    SQLITE_PRODUCTION = os.environ.get("SQLITE_PRODUCTION", "0") == "1"
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # negative = size in KiB (here 64 MB of page cache per connection)
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))
+    SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "8"))
+    SQLITE_POOL_OVERFLOW = int(os.environ.get("SQLITE_POOL_OVERFLOW", "4"))
+    SQLITE_POOL_TIMEOUT = int(os.environ.get("SQLITE_POOL_TIMEOUT", "10"))
+    # Batch short write transactions through one writer thread per process
+    # (services/write_queue.py). With SQLite it needs SQLITE_PRODUCTION=1.
+    WRITE_QUEUE_ENABLED = os.environ.get("WRITE_QUEUE_ENABLED", "0") == "1"
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get("WRITE_QUEUE_MAX_BATCH", "32"))
+    WRITE_QUEUE_MAX_DELAY_MS = int(os.environ.get("WRITE_QUEUE_MAX_DELAY_MS", "5"))
+    # Seconds a request waits for its queued write; after that the write may
+    # still be applied, and the request says so instead of failing
+    WRITE_QUEUE_TIMEOUT = float(os.environ.get("WRITE_QUEUE_TIMEOUT", "10"))
@@ -0,0 +1,86 @@
+"""Ordered schema migrations, tracked in the ``schema_version`` table.
+
+Migrations run once, from ``flask --app app upgrade-db``; the web process
+only compares the recorded version with ``head()``. SQLite runs most DDL
+outside a transaction, so every migration must be safe to re-run after a
+partial failure (``IF NOT EXISTS``, column checks, ...).
+
+To add one: create ``mNNNN_<name>.py`` with ``upgrade(conn)`` and append it
+to ``MIGRATIONS``. Never reorder or edit a migration that has shipped.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from migrations import (
+    m0001_baseline,
+    m0002_car_owner,
+    m0003_work_order_indexes,
+    m0004_stock_ledger,
+    m0005_idempotency_keys,
+    m0006_order_archive,
+    m0007_search_index,
+    m0008_reporting_rollups,
+    m0009_work_order_counters,
+    m0010_monotonic_work_order_ids,
+    m0011_ledger_outlives_parts,
+)
+
+MIGRATIONS = [
+    m0001_baseline,
+    m0002_car_owner,
+    m0003_work_order_indexes,
+    m0004_stock_ledger,
+    m0005_idempotency_keys,
+    m0006_order_archive,
+    m0007_search_index,
+    m0008_reporting_rollups,
+    m0009_work_order_counters,
+    m0010_monotonic_work_order_ids,
+    m0011_ledger_outlives_parts,
+]
+
+
+def head():
+    return len(MIGRATIONS)
+
+
+def current_version(engine):
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except OperationalError:
+        # no schema_version table yet
+        return 0
+
+
+def upgrade(engine, log=None):
+    """Apply pending migrations in order. Returns the list of applied names."""
+    applied = []
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR(80) NOT NULL,"
+            " applied_at VARCHAR(32) NOT NULL)"
+        ))
+        conn.commit()
+
+        for version, module in enumerate(MIGRATIONS, start=1):
+            done = conn.execute(
+                text("SELECT 1 FROM schema_version WHERE version = :v"), {"v": version}
+            ).first()
+            if done:
+                continue
+            name = module.__name__.rsplit(".", 1)[-1]
+            if log:
+                log(f"applying {name}")
+            module.upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.now(timezone.utc).isoformat(timespec="seconds")},
+            )
+            conn.commit()
+            applied.append(name)
+    return applied
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+
+def column_names(conn, table):
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def add_column(conn, table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    if column not in column_names(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+@contextmanager
+def table_rebuild(conn):
+    """Cursor for rebuilding tables ("12 step" ALTER), in one transaction.
+
+    foreign_keys must be off for DROP TABLE and can only change outside a
+    transaction; legacy_alter_table keeps the rename from re-checking views
+    and triggers that still name the dropped table. Both are restored after.
+    """
+    conn.commit()
+    raw = conn.connection.driver_connection
+    cur = raw.cursor()
+    foreign_keys = cur.execute("PRAGMA foreign_keys").fetchone()[0]
+    cur.execute("PRAGMA foreign_keys=OFF")
+    cur.execute("PRAGMA legacy_alter_table=ON")
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        yield cur
+        cur.execute("COMMIT")
+    except Exception:
+        if raw.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    finally:
+        cur.execute("PRAGMA legacy_alter_table=OFF")
+        cur.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+        cur.close()
+
+
+def rebuild_table(cur, table, columns, ddl):
+    """Copy ``table`` into ``ddl`` (with a {name} placeholder) and rename it over the original.
+
+    Indexes and triggers on the table are recreated from sqlite_master.
+    """
+    tmp = f"{table}_rebuild"
+    dependents = [
+        sql for (sql,) in cur.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+            "AND sql IS NOT NULL ORDER BY type",
+            (table,),
+        )
+    ]
+    cur.execute(f"DROP TABLE IF EXISTS {tmp}")
+    cur.execute(ddl.format(name=tmp))
+    cur.execute(f"INSERT INTO {tmp} ({columns}) SELECT {columns} FROM {table}")
+    cur.execute(f"DROP TABLE {table}")
+    cur.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+    for sql in dependents:
+        cur.execute(sql)
+
+
+def table_sql(conn, table):
+    return conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"), {"t": table}
+    ).scalar() or ""
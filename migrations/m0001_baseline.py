@@ -0,0 +1,77 @@
+"""Tables as they existed before schema versioning.
+
+Databases created by older releases already have them (possibly without the
+``image_filename`` columns, which used to be added at startup).
+"""
+from sqlalchemy import text
+
+from migrations.helpers import add_column
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS user (
+        id INTEGER NOT NULL,
+        username VARCHAR(80) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (username)
+    )""",
+    """CREATE TABLE IF NOT EXISTS car (
+        id INTEGER NOT NULL,
+        vin VARCHAR(50) NOT NULL,
+        make VARCHAR(80),
+        model VARCHAR(80),
+        year INTEGER,
+        owner_name VARCHAR(120),
+        owner_phone VARCHAR(50),
+        image_filename VARCHAR(255),
+        PRIMARY KEY (id),
+        UNIQUE (vin)
+    )""",
+    """CREATE TABLE IF NOT EXISTS part (
+        id INTEGER NOT NULL,
+        part_number VARCHAR(80) NOT NULL,
+        name VARCHAR(120) NOT NULL,
+        description TEXT,
+        quantity INTEGER,
+        unit_price FLOAT,
+        image_filename VARCHAR(255),
+        PRIMARY KEY (id),
+        UNIQUE (part_number)
+    )""",
+    """CREATE TABLE IF NOT EXISTS work_order (
+        id INTEGER NOT NULL,
+        car_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        mechanic_id INTEGER,
+        status VARCHAR(20),
+        description TEXT,
+        PRIMARY KEY (id),
+        FOREIGN KEY(car_id) REFERENCES car (id),
+        FOREIGN KEY(client_id) REFERENCES user (id),
+        FOREIGN KEY(mechanic_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS work_order_part (
+        id INTEGER NOT NULL,
+        work_order_id INTEGER NOT NULL,
+        part_id INTEGER NOT NULL,
+        quantity_used INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(work_order_id) REFERENCES work_order (id),
+        FOREIGN KEY(part_id) REFERENCES part (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS work_order_image (
+        id INTEGER NOT NULL,
+        work_order_id INTEGER NOT NULL,
+        filename VARCHAR(255) NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(work_order_id) REFERENCES work_order (id)
+    )""",
+]
+
+
+def upgrade(conn):
+    for ddl in TABLES:
+        conn.execute(text(ddl))
+    add_column(conn, "car", "image_filename", "VARCHAR(255)")
+    add_column(conn, "part", "image_filename", "VARCHAR(255)")
@@ -0,0 +1,18 @@
+"""Car.owner_id foreign key (backfilled from owner_name) and catalog indexes."""
+from sqlalchemy import text
+
+from migrations.helpers import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "car", "owner_id", "INTEGER REFERENCES user (id)")
+    conn.execute(text(
+        "UPDATE car SET owner_id = (SELECT user.id FROM user WHERE user.username = car.owner_name) "
+        "WHERE owner_id IS NULL"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_car_owner_id ON car (owner_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_car_year ON car (year)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_car_make_lower ON car (lower(make))"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_car_model_lower ON car (lower(model))"))
+    # briefly created at startup by an earlier release; owner_id replaces it
+    conn.execute(text("DROP INDEX IF EXISTS ix_car_owner_name"))
@@ -0,0 +1,17 @@
+"""Secondary indexes on work order foreign keys and status."""
+from sqlalchemy import text
+
+INDEXES = [
+    ("ix_work_order_car_id", "work_order", "car_id"),
+    ("ix_work_order_client_id", "work_order", "client_id"),
+    ("ix_work_order_mechanic_id", "work_order", "mechanic_id"),
+    ("ix_work_order_status", "work_order", "status"),
+    ("ix_work_order_part_work_order_id", "work_order_part", "work_order_id"),
+    ("ix_work_order_part_part_id", "work_order_part", "part_id"),
+    ("ix_work_order_image_work_order_id", "work_order_image", "work_order_id"),
+]
+
+
+def upgrade(conn):
+    for name, table, column in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
@@ -0,0 +1,47 @@
+"""Stock movement ledger and daily per-part rollup.
+
+Existing quantities are booked as an opening-balance adjustment so the
+ledger adds up to Part.quantity from the start.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS stock_movement (
+        id INTEGER NOT NULL,
+        part_id INTEGER NOT NULL,
+        kind VARCHAR(20) NOT NULL,
+        quantity INTEGER NOT NULL,
+        work_order_id INTEGER,
+        note VARCHAR(255),
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(part_id) REFERENCES part (id)
+    )"""))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stock_movement_part_id ON stock_movement (part_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stock_movement_work_order_id ON stock_movement (work_order_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_stock_movement_created_at ON stock_movement (created_at)"))
+
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS part_stock_daily (
+        part_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        received INTEGER NOT NULL,
+        consumed INTEGER NOT NULL,
+        adjusted INTEGER NOT NULL,
+        closing INTEGER NOT NULL,
+        PRIMARY KEY (part_id, day),
+        FOREIGN KEY(part_id) REFERENCES part (id)
+    )"""))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_part_stock_daily_day ON part_stock_daily (day)"))
+
+    already = conn.execute(text("SELECT 1 FROM stock_movement LIMIT 1")).first()
+    if not already:
+        conn.execute(text(
+            "INSERT INTO stock_movement (part_id, kind, quantity, note, created_at) "
+            "SELECT id, 'adjustment', quantity, 'opening balance', datetime('now') "
+            "FROM part WHERE COALESCE(quantity, 0) != 0"
+        ))
+        conn.execute(text(
+            "INSERT INTO part_stock_daily (part_id, day, received, consumed, adjusted, closing) "
+            "SELECT id, date('now'), 0, 0, quantity, quantity FROM part WHERE COALESCE(quantity, 0) != 0"
+        ))
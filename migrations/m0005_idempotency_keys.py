@@ -0,0 +1,14 @@
+"""Idempotency keys for form submissions (work order intake)."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS idempotency_key (
+        key VARCHAR(64) NOT NULL,
+        user_id INTEGER NOT NULL,
+        work_order_id INTEGER,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (key),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )"""))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_idempotency_key_created_at ON idempotency_key (created_at)"))
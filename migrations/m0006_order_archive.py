@@ -0,0 +1,67 @@
+"""Work order timestamps, archive tables and read-only history views."""
+from sqlalchemy import text
+
+from migrations.helpers import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "work_order", "created_at", "DATETIME")
+    add_column(conn, "work_order", "completed_at", "DATETIME")
+    # real dates are unknown for existing rows; count them from the upgrade
+    conn.execute(text("UPDATE work_order SET created_at = datetime('now') WHERE created_at IS NULL"))
+    conn.execute(text(
+        "UPDATE work_order SET completed_at = datetime('now') "
+        "WHERE status = 'completed' AND completed_at IS NULL"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_work_order_completed_at ON work_order (completed_at)"))
+
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS work_order_archive (
+        id INTEGER NOT NULL,
+        car_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        mechanic_id INTEGER,
+        status VARCHAR(20),
+        description TEXT,
+        created_at DATETIME,
+        completed_at DATETIME,
+        archived_at DATETIME NOT NULL,
+        PRIMARY KEY (id)
+    )"""))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_work_order_archive_car_id ON work_order_archive (car_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_work_order_archive_client_id ON work_order_archive (client_id)"))
+
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS work_order_part_archive (
+        id INTEGER NOT NULL,
+        work_order_id INTEGER NOT NULL,
+        part_id INTEGER NOT NULL,
+        quantity_used INTEGER NOT NULL,
+        PRIMARY KEY (id)
+    )"""))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_work_order_part_archive_work_order_id "
+        "ON work_order_part_archive (work_order_id)"
+    ))
+
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS work_order_image_archive (
+        id INTEGER NOT NULL,
+        work_order_id INTEGER NOT NULL,
+        filename VARCHAR(255) NOT NULL,
+        PRIMARY KEY (id)
+    )"""))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_work_order_image_archive_work_order_id "
+        "ON work_order_image_archive (work_order_id)"
+    ))
+
+    conn.execute(text("""CREATE VIEW IF NOT EXISTS work_order_history AS
+        SELECT id, car_id, client_id, mechanic_id, status, description,
+               created_at, completed_at, NULL AS archived_at, 0 AS archived
+        FROM work_order
+        UNION ALL
+        SELECT id, car_id, client_id, mechanic_id, status, description,
+               created_at, completed_at, archived_at, 1 AS archived
+        FROM work_order_archive"""))
+    conn.execute(text("""CREATE VIEW IF NOT EXISTS work_order_part_history AS
+        SELECT work_order_id, part_id, quantity_used FROM work_order_part
+        UNION ALL
+        SELECT work_order_id, part_id, quantity_used FROM work_order_part_archive"""))
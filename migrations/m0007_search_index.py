@@ -0,0 +1,73 @@
+"""FTS5 search index over parts, work orders and cars, kept in sync by triggers.
+
+One row per record; its rowid encodes the source (``id * 4 + kind``, see
+services/search.py) so triggers and deletes hit it by rowid. Update
+triggers only fire for the indexed columns, so stock and status changes
+never touch the index.
+"""
+from sqlalchemy import text
+
+PART, WORK_ORDER, CAR = 1, 2, 3
+
+PART_TITLE = "{r}.part_number || ' ' || {r}.name"
+CAR_TITLE = "coalesce({r}.make, '') || ' ' || coalesce({r}.model, '') || ' ' || {r}.vin"
+# a work order is found by its car as well as by its description
+ORDER_TITLE = (
+    "(SELECT coalesce(make, '') || ' ' || coalesce(model, '') || ' ' || vin "
+    "FROM car WHERE car.id = {r}.car_id)"
+)
+
+
+def _sync_triggers(table, kind, title, body, columns):
+    row_id = "{r}.id * 4 + %d" % kind
+    insert = (
+        f"INSERT INTO search_index (rowid, title, body) VALUES "
+        f"({row_id.format(r='new')}, {title.format(r='new')}, coalesce({body.format(r='new')}, ''));"
+    )
+    delete = f"DELETE FROM search_index WHERE rowid = {row_id.format(r='old')};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    # ORDER BY rank: bm25 with title matches weighted above body matches
+    conn.execute(text("INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(5.0, 1.0)')"))
+
+    statements = (
+        _sync_triggers("part", PART, PART_TITLE, "{r}.description", "part_number, name, description")
+        + _sync_triggers("work_order", WORK_ORDER, ORDER_TITLE, "{r}.description", "car_id, description")
+        + _sync_triggers("car", CAR, CAR_TITLE, "{r}.owner_name", "make, model, vin, owner_name")
+    )
+    statements.append(
+        # renaming a car re-indexes its orders
+        "CREATE TRIGGER IF NOT EXISTS search_car_orders_au AFTER UPDATE OF make, model, vin ON car BEGIN "
+        "DELETE FROM search_index WHERE rowid IN (SELECT id * 4 + %d FROM work_order WHERE car_id = new.id); "
+        "INSERT INTO search_index (rowid, title, body) SELECT id * 4 + %d, %s, coalesce(description, '') "
+        "FROM work_order WHERE car_id = new.id; END" % (WORK_ORDER, WORK_ORDER, CAR_TITLE.format(r="new"))
+    )
+    for statement in statements:
+        conn.execute(text(statement))
+
+    # backfill (from scratch, so a re-run after a partial failure is safe)
+    conn.execute(text("DELETE FROM search_index"))
+    conn.execute(text(
+        f"INSERT INTO search_index (rowid, title, body) "
+        f"SELECT id * 4 + {PART}, {PART_TITLE.format(r='part')}, coalesce(description, '') FROM part"
+    ))
+    conn.execute(text(
+        f"INSERT INTO search_index (rowid, title, body) "
+        f"SELECT id * 4 + {WORK_ORDER}, {ORDER_TITLE.format(r='work_order')}, coalesce(description, '') "
+        f"FROM work_order"
+    ))
+    conn.execute(text(
+        f"INSERT INTO search_index (rowid, title, body) "
+        f"SELECT id * 4 + {CAR}, {CAR_TITLE.format(r='car')}, coalesce(owner_name, '') FROM car"
+    ))
@@ -0,0 +1,71 @@
+"""Daily reporting rollups (see services/reporting.py), filled from history.
+
+- part_usage_daily: units of a part used on work orders and their value,
+  and part_usage_monthly, the same per month;
+- mechanic_daily: orders each mechanic completed per day;
+- open_order_daily: orders not yet completed, by the day they were created.
+
+The tables are filled once here; ``flask --app app backfill-reports``
+rebuilds them the same way. Part usage comes from the consumption ledger,
+or from the order's dates for lines booked before the ledger existed, and
+is valued at today's unit price.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS part_usage_daily (
+        day DATE NOT NULL,
+        part_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        revenue FLOAT NOT NULL,
+        PRIMARY KEY (day, part_id)
+    )"""))
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS part_usage_monthly (
+        month DATE NOT NULL,
+        part_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        revenue FLOAT NOT NULL,
+        PRIMARY KEY (month, part_id)
+    )"""))
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS mechanic_daily (
+        day DATE NOT NULL,
+        mechanic_id INTEGER NOT NULL,
+        completed INTEGER NOT NULL,
+        PRIMARY KEY (day, mechanic_id)
+    )"""))
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS open_order_daily (
+        day DATE NOT NULL,
+        open_count INTEGER NOT NULL,
+        PRIMARY KEY (day)
+    )"""))
+
+    # OR IGNORE: re-running after a partial failure keeps the rows already filled
+    conn.execute(text("""INSERT OR IGNORE INTO part_usage_daily (day, part_id, quantity, revenue)
+        SELECT day, part_id, SUM(qty), SUM(qty * price) FROM (
+            SELECT date(m.created_at) AS day, m.part_id, -m.quantity AS qty,
+                   COALESCE(p.unit_price, 0) AS price
+            FROM stock_movement m LEFT JOIN part p ON p.id = m.part_id
+            WHERE m.kind = 'consumption'
+            UNION ALL
+            SELECT date(COALESCE(o.completed_at, o.created_at)), l.part_id, l.quantity_used,
+                   COALESCE(p.unit_price, 0)
+            FROM work_order_part_history l
+            JOIN work_order_history o ON o.id = l.work_order_id
+            LEFT JOIN part p ON p.id = l.part_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM stock_movement m
+                WHERE m.work_order_id = l.work_order_id AND m.part_id = l.part_id
+                  AND m.kind = 'consumption')
+        ) GROUP BY day, part_id"""))
+    conn.execute(text("""INSERT OR IGNORE INTO part_usage_monthly (month, part_id, quantity, revenue)
+        SELECT strftime('%Y-%m-01', day), part_id, SUM(quantity), SUM(revenue)
+        FROM part_usage_daily GROUP BY 1, 2"""))
+    conn.execute(text("""INSERT OR IGNORE INTO mechanic_daily (day, mechanic_id, completed)
+        SELECT date(completed_at), mechanic_id, COUNT(*) FROM work_order_history
+        WHERE status = 'completed' AND mechanic_id IS NOT NULL AND completed_at IS NOT NULL
+        GROUP BY 1, 2"""))
+    conn.execute(text("""INSERT OR IGNORE INTO open_order_daily (day, open_count)
+        SELECT date(created_at), COUNT(*) FROM work_order
+        WHERE COALESCE(status, 'open') != 'completed' AND created_at IS NOT NULL
+        GROUP BY 1"""))
@@ -0,0 +1,43 @@
+"""Live work order counts per (status, mechanic), kept by triggers.
+
+Every insert, status / mechanic change and delete of a hot work order
+moves one count, so the dashboards read a table with one row per status
+and mechanic instead of counting work_order. ``mechanic_id`` 0 stands for
+unassigned (a primary key column cannot be NULL). Archived and deleted
+orders leave the counts with their rows.
+"""
+from sqlalchemy import text
+
+INCREMENT = (
+    "INSERT INTO work_order_counter (status, mechanic_id, count) "
+    "VALUES (COALESCE(new.status, 'open'), COALESCE(new.mechanic_id, 0), 1) "
+    "ON CONFLICT (status, mechanic_id) DO UPDATE SET count = count + 1;"
+)
+DECREMENT = (
+    "UPDATE work_order_counter SET count = count - 1 "
+    "WHERE status = COALESCE(old.status, 'open') AND mechanic_id = COALESCE(old.mechanic_id, 0);"
+)
+
+
+def upgrade(conn):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS work_order_counter (
+        status VARCHAR(20) NOT NULL,
+        mechanic_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (status, mechanic_id)
+    )"""))
+    for sql in (
+        f"CREATE TRIGGER IF NOT EXISTS work_order_counter_ai AFTER INSERT ON work_order BEGIN {INCREMENT} END",
+        f"CREATE TRIGGER IF NOT EXISTS work_order_counter_au AFTER UPDATE OF status, mechanic_id ON work_order "
+        f"WHEN old.status IS NOT new.status OR old.mechanic_id IS NOT new.mechanic_id "
+        f"BEGIN {DECREMENT} {INCREMENT} END",
+        f"CREATE TRIGGER IF NOT EXISTS work_order_counter_ad AFTER DELETE ON work_order BEGIN {DECREMENT} END",
+    ):
+        conn.execute(text(sql))
+
+    # rebuilt, not added to: safe to re-run with the triggers already in place
+    conn.execute(text("DELETE FROM work_order_counter"))
+    conn.execute(text(
+        "INSERT INTO work_order_counter (status, mechanic_id, count) "
+        "SELECT COALESCE(status, 'open'), COALESCE(mechanic_id, 0), COUNT(*) FROM work_order GROUP BY 1, 2"
+    ))
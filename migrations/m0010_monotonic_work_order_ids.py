@@ -0,0 +1,79 @@
+"""Never reuse work order ids: rebuild the hot order tables with AUTOINCREMENT.
+
+A plain INTEGER PRIMARY KEY hands out MAX(id) + 1, so once the newest
+orders are archived (or deleted with their car) the next order gets an id
+that is already in work_order_archive - the archive insert then fails on
+its primary key, and the stock ledger's work_order_id points at two
+orders. With AUTOINCREMENT SQLite keeps a high-water mark in
+sqlite_sequence; it is seeded here from the archive tables and the ledger.
+
+SQLite cannot add AUTOINCREMENT to an existing table, so each table is
+copied into a new one that is renamed over it (the documented "12 step"
+rebuild), with its indexes and triggers recreated from sqlite_master.
+Tables that already have AUTOINCREMENT are skipped, so it can be re-run.
+"""
+from migrations.helpers import rebuild_table, table_rebuild, table_sql
+
+# table -> (columns, DDL of the rebuilt table with a {name} placeholder, ids already handed out)
+TABLES = {
+    "work_order": (
+        "id, car_id, client_id, mechanic_id, status, description, created_at, completed_at",
+        """CREATE TABLE {name} (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            car_id INTEGER NOT NULL,
+            client_id INTEGER NOT NULL,
+            mechanic_id INTEGER,
+            status VARCHAR(20),
+            description TEXT,
+            created_at DATETIME,
+            completed_at DATETIME,
+            FOREIGN KEY(car_id) REFERENCES car (id),
+            FOREIGN KEY(client_id) REFERENCES user (id),
+            FOREIGN KEY(mechanic_id) REFERENCES user (id)
+        )""",
+        ("SELECT MAX(id) FROM work_order_archive",
+         "SELECT MAX(work_order_id) FROM stock_movement"),
+    ),
+    "work_order_part": (
+        "id, work_order_id, part_id, quantity_used",
+        """CREATE TABLE {name} (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            work_order_id INTEGER NOT NULL,
+            part_id INTEGER NOT NULL,
+            quantity_used INTEGER NOT NULL,
+            FOREIGN KEY(work_order_id) REFERENCES work_order (id),
+            FOREIGN KEY(part_id) REFERENCES part (id)
+        )""",
+        ("SELECT MAX(id) FROM work_order_part_archive",),
+    ),
+    "work_order_image": (
+        "id, work_order_id, filename",
+        """CREATE TABLE {name} (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            work_order_id INTEGER NOT NULL,
+            filename VARCHAR(255) NOT NULL,
+            FOREIGN KEY(work_order_id) REFERENCES work_order (id)
+        )""",
+        ("SELECT MAX(id) FROM work_order_image_archive",),
+    ),
+}
+
+
+def _seed_sequence(cur, table, seen):
+    high = max(
+        cur.execute(sql).fetchone()[0] or 0
+        for sql in (f"SELECT MAX(id) FROM {table}", *seen)
+    )
+    cur.execute("DELETE FROM sqlite_sequence WHERE name IN (?, ?)", (table, f"{table}_rebuild"))
+    cur.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, high))
+
+
+def upgrade(conn):
+    pending = [table for table in TABLES if "AUTOINCREMENT" not in table_sql(conn, table).upper()]
+    if not pending:
+        return
+    with table_rebuild(conn) as cur:
+        for table in pending:
+            columns, ddl, seen = TABLES[table]
+            rebuild_table(cur, table, columns, ddl)
+            _seed_sequence(cur, table, seen)
@@ -0,0 +1,45 @@
+"""Keep a deleted part's stock ledger: drop the part FK from the ledger tables.
+
+stock_movement and part_stock_daily referenced part (id), so deleting a part
+had to delete its movements too, and the audit trail went with it. Like
+stock_movement.work_order_id, part_id becomes a plain column; a deleted part
+is booked down to zero instead (services/inventory.py ``retire_part``).
+"""
+from migrations.helpers import rebuild_table, table_rebuild, table_sql
+
+TABLES = {
+    "stock_movement": (
+        "id, part_id, kind, quantity, work_order_id, note, created_at",
+        """CREATE TABLE {name} (
+            id INTEGER NOT NULL,
+            part_id INTEGER NOT NULL,
+            kind VARCHAR(20) NOT NULL,
+            quantity INTEGER NOT NULL,
+            work_order_id INTEGER,
+            note VARCHAR(255),
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+    ),
+    "part_stock_daily": (
+        "part_id, day, received, consumed, adjusted, closing",
+        """CREATE TABLE {name} (
+            part_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            received INTEGER NOT NULL,
+            consumed INTEGER NOT NULL,
+            adjusted INTEGER NOT NULL,
+            closing INTEGER NOT NULL,
+            PRIMARY KEY (part_id, day)
+        )""",
+    ),
+}
+
+
+def upgrade(conn):
+    pending = [table for table in TABLES if "REFERENCES PART" in table_sql(conn, table).upper()]
+    if not pending:
+        return
+    with table_rebuild(conn) as cur:
+        for table in pending:
+            rebuild_table(cur, table, *TABLES[table])
@@ -1,14 +1,27 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from flask import url_for
 
 db = SQLAlchemy()
 
+
+def utcnow():
+    # naive UTC, which is what SQLite DateTime columns store
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Role:
     MANAGER = "manager"
     MECHANIC = "mechanic"
     CLIENT = "client"
 
+class MovementKind:
+    RECEIPT = "receipt"
+    CONSUMPTION = "consumption"
+    ADJUSTMENT = "adjustment"
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -23,11 +36,18 @@ class Car(db.Model):
     vin = db.Column(db.String(50), unique=True, nullable=False)
     make = db.Column(db.String(80))
     model = db.Column(db.String(80))
-    year = db.Column(db.Integer)
+    year = db.Column(db.Integer, index=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), index=True)
     owner_name = db.Column(db.String(120))
     owner_phone = db.Column(db.String(50))
     image_filename = db.Column(db.String(255))
 
+    owner = db.relationship("User", foreign_keys=[owner_id])
+
+# Case-insensitive prefix search on make/model (see cars._apply_search)
+db.Index("ix_car_make_lower", db.func.lower(Car.make))
+db.Index("ix_car_model_lower", db.func.lower(Car.model))
+
 class Part(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     part_number = db.Column(db.String(80), unique=True, nullable=False)
@@ -38,12 +58,17 @@ class Part(db.Model):
     unit_price = db.Column(db.Float, default=0.0)
 
 class WorkOrder(db.Model):
+    # AUTOINCREMENT: ids of archived/deleted orders are never handed out again
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id = db.Column(db.Integer, primary_key=True)
-    car_id = db.Column(db.Integer, db.ForeignKey("car.id"), nullable=False)
-    client_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    mechanic_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    status = db.Column(db.String(20), default="open")
+    car_id = db.Column(db.Integer, db.ForeignKey("car.id"), nullable=False, index=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    mechanic_id = db.Column(db.Integer, db.ForeignKey("user.id"), index=True)
+    status = db.Column(db.String(20), default="open", index=True)
     description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    completed_at = db.Column(db.DateTime, index=True)
 
     car = db.relationship("Car", backref="work_orders")
     client = db.relationship("User", foreign_keys=[client_id])
@@ -51,9 +76,11 @@ class WorkOrder(db.Model):
     images = db.relationship("WorkOrderImage", backref="work_order", cascade="all, delete-orphan")
 
 class WorkOrderPart(db.Model):
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id = db.Column(db.Integer, primary_key=True)
-    work_order_id = db.Column(db.Integer, db.ForeignKey("work_order.id"), nullable=False)
-    part_id = db.Column(db.Integer, db.ForeignKey("part.id"), nullable=False)
+    work_order_id = db.Column(db.Integer, db.ForeignKey("work_order.id"), nullable=False, index=True)
+    part_id = db.Column(db.Integer, db.ForeignKey("part.id"), nullable=False, index=True)
     quantity_used = db.Column(db.Integer, nullable=False)
 
     work_order = db.relationship("WorkOrder", backref="parts_used")
@@ -61,10 +88,119 @@ class WorkOrderPart(db.Model):
 
 
 class WorkOrderImage(db.Model):
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id = db.Column(db.Integer, primary_key=True)
-    work_order_id = db.Column(db.Integer, db.ForeignKey("work_order.id"), nullable=False)
+    work_order_id = db.Column(db.Integer, db.ForeignKey("work_order.id"), nullable=False, index=True)
     filename = db.Column(db.String(255), nullable=False)
 
     def url(self):
         # returns a url for the static file (requires app context)
         return url_for('static', filename=self.filename)
+
+
+class StockMovement(db.Model):
+    """Append-only ledger of every change to Part.quantity (signed deltas)."""
+    id = db.Column(db.Integer, primary_key=True)
+    # plain columns, not FKs: the ledger outlives deleted parts and archived orders
+    part_id = db.Column(db.Integer, nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    work_order_id = db.Column(db.Integer, index=True)
+    note = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
+
+
+class PartStockDaily(db.Model):
+    """Per part and day rollup of StockMovement, maintained on every movement.
+
+    ``closing`` is the on-hand quantity after the day's last movement.
+    """
+    part_id = db.Column(db.Integer, primary_key=True)  # no FK, like StockMovement
+    day = db.Column(db.Date, primary_key=True, index=True)
+    received = db.Column(db.Integer, nullable=False, default=0)
+    consumed = db.Column(db.Integer, nullable=False, default=0)
+    adjusted = db.Column(db.Integer, nullable=False, default=0)
+    closing = db.Column(db.Integer, nullable=False, default=0)
+
+
+# -------------------------
+# REPORTING ROLLUPS (see services/reporting.py)
+# -------------------------
+# Plain id columns, not FKs: report history outlives deleted parts and cars.
+
+class PartUsageDaily(db.Model):
+    """Units of a part used on work orders per day, valued at the price of the day."""
+    day = db.Column(db.Date, primary_key=True)
+    part_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class PartUsageMonthly(db.Model):
+    """PartUsageDaily summed per month (``month`` is its first day), for long ranges."""
+    month = db.Column(db.Date, primary_key=True)
+    part_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class MechanicDaily(db.Model):
+    """Work orders a mechanic completed per day (by completed_at)."""
+    day = db.Column(db.Date, primary_key=True)
+    mechanic_id = db.Column(db.Integer, primary_key=True)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+
+class OpenOrderDaily(db.Model):
+    """Number of not yet completed work orders per creation day."""
+    day = db.Column(db.Date, primary_key=True)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class WorkOrderCounter(db.Model):
+    """Hot work orders per status and mechanic (0 = unassigned), kept by triggers."""
+    status = db.Column(db.String(20), primary_key=True)
+    mechanic_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(db.Model):
+    """Key of an already processed form submission (see services/idempotency.py)."""
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    work_order_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
+
+
+# -------------------------
+# ARCHIVE (see services/archive.py)
+# -------------------------
+# Completed orders older than N days are moved here with their parts and
+# images. No foreign keys: archived history outlives deleted cars and parts.
+# The read-only views work_order_history / work_order_part_history union
+# the hot and archived rows.
+
+class WorkOrderArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    car_id = db.Column(db.Integer, nullable=False, index=True)
+    client_id = db.Column(db.Integer, nullable=False, index=True)
+    mechanic_id = db.Column(db.Integer)
+    status = db.Column(db.String(20))
+    description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+
+class WorkOrderPartArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    work_order_id = db.Column(db.Integer, nullable=False, index=True)
+    part_id = db.Column(db.Integer, nullable=False)
+    quantity_used = db.Column(db.Integer, nullable=False)
+
+
+class WorkOrderImageArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    work_order_id = db.Column(db.Integer, nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
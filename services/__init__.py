@@ -0,0 +1 @@
+# just to make it a package
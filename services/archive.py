@@ -0,0 +1,82 @@
+"""Archival of completed work orders and set-based deletes.
+
+``archive_completed`` moves completed orders older than N days, with their
+parts and images, from the hot tables into the *_archive tables in batches
+of INSERT ... SELECT / DELETE statements. Hot tables and their indexes stay
+proportional to recent activity; the history views (work_order_history,
+work_order_part_history) still show everything, read-only. Rows keep
+their ids in the archive; the hot tables are AUTOINCREMENT (migration
+m0010), so a new order never gets the id of an archived or deleted one.
+"""
+from datetime import timedelta
+
+from sqlalchemy import bindparam, delete, select, text
+
+from models import db, WorkOrder, WorkOrderPart, WorkOrderImage, Car, utcnow
+
+
+def delete_car_cascade(car_id):
+    """Delete a car and all of its hot work orders with four statements."""
+    order_ids = select(WorkOrder.id).where(WorkOrder.car_id == car_id).scalar_subquery()
+    for stmt in (
+        delete(WorkOrderPart).where(WorkOrderPart.work_order_id.in_(order_ids)),
+        delete(WorkOrderImage).where(WorkOrderImage.work_order_id.in_(order_ids)),
+        delete(WorkOrder).where(WorkOrder.car_id == car_id),
+        delete(Car).where(Car.id == car_id),
+    ):
+        db.session.execute(stmt, execution_options={"synchronize_session": False})
+
+
+def archive_completed(older_than_days, batch_size=500, log=None):
+    """Move completed orders finished more than ``older_than_days`` ago. Returns the count."""
+    cutoff = utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        ids = [
+            row[0] for row in db.session.execute(
+                select(WorkOrder.id)
+                .where(WorkOrder.status == "completed", WorkOrder.completed_at < cutoff)
+                .order_by(WorkOrder.id)
+                .limit(batch_size)
+            )
+        ]
+        if not ids:
+            break
+        _move_batch(ids)
+        db.session.commit()
+        moved += len(ids)
+        if log:
+            log(f"archived {moved} order(s)")
+    return moved
+
+
+def _move_batch(ids):
+    params = {"ids": ids, "now": utcnow()}
+    in_ids = "IN :ids"  # expanding bind parameter
+    statements = [
+        f"""INSERT INTO work_order_archive
+               (id, car_id, client_id, mechanic_id, status, description, created_at, completed_at, archived_at)
+            SELECT id, car_id, client_id, mechanic_id, status, description, created_at, completed_at, :now
+            FROM work_order WHERE id {in_ids}""",
+        f"""INSERT INTO work_order_part_archive (id, work_order_id, part_id, quantity_used)
+            SELECT id, work_order_id, part_id, quantity_used
+            FROM work_order_part WHERE work_order_id {in_ids}""",
+        f"""INSERT INTO work_order_image_archive (id, work_order_id, filename)
+            SELECT id, work_order_id, filename
+            FROM work_order_image WHERE work_order_id {in_ids}""",
+        f"DELETE FROM work_order_part WHERE work_order_id {in_ids}",
+        f"DELETE FROM work_order_image WHERE work_order_id {in_ids}",
+        f"DELETE FROM work_order WHERE id {in_ids}",
+    ]
+    for sql in statements:
+        db.session.execute(text(sql).bindparams(bindparam("ids", expanding=True)), params)
+
+
+def car_history(car_id):
+    """Archived orders of a car (newest first) from the work_order_history view."""
+    return db.session.execute(text(
+        """SELECT h.id, h.description, h.status, h.completed_at, h.archived_at, u.username AS mechanic
+           FROM work_order_history h LEFT JOIN user u ON u.id = h.mechanic_id
+           WHERE h.car_id = :car_id AND h.archived = 1
+           ORDER BY h.id DESC"""
+    ), {"car_id": car_id}).all()
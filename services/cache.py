@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class VersionedCache:
+    """Small in-process LRU cache for near-static lookups.
+
+    Entries live under a namespace ("parts", "users", ...). Writers call
+    ``bump(namespace)`` after committing, which moves readers to a new
+    version and drops the stale entries. ``ttl`` is a safety net for other
+    worker processes, whose version counters are not bumped by our writes.
+    """
+
+    def __init__(self, max_entries=256, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_entries=None, ttl=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict()
+
+    def version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def get_or_load(self, namespace, key, loader):
+        cache_key = (namespace, self.version(namespace), key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and (not self.ttl or now - entry[0] < self.ttl):
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # load outside the lock; two threads may both load on a cold key,
+        # which is cheaper than serializing every reader behind the query
+        value = loader()
+        with self._lock:
+            self._entries[cache_key] = (now, value)
+            self._entries.move_to_end(cache_key)
+            self._evict()
+        return value
+
+    def bump(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            for k in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[k]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "versions": dict(self._versions),
+            }
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,296 @@
+"""Bulk CSV import and export for parts and cars.
+
+Import reads the file row by row and writes in chunks: each chunk is one
+executemany ``INSERT ... ON CONFLICT DO UPDATE`` on the natural key
+(``part_number`` / ``vin``) and one commit, so a 50k-line catalog is a
+few dozen round trips rather than 50k form posts. Only the columns present
+in the file are written; invalid rows are skipped and reported by line.
+
+A part's ``quantity`` in the file is its on-hand count. The difference to
+the current quantity is booked in the stock ledger (receipt for new parts,
+adjustment for existing ones), so reconcile-stock stays clean. Existing
+parts get their count by compare-and-set, like a stocktake: stock consumed
+while the import runs is re-read, never overwritten unbooked.
+
+Export streams rows from the database cursor (``yield_per``) through the
+csv module, one chunk of lines at a time.
+"""
+import csv
+import io
+from collections import namedtuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Part, Car, User, MovementKind
+from services import inventory, lookups
+
+MAX_REPORTED_ERRORS = 200
+
+PART_COLUMNS = ("part_number", "name", "description", "quantity", "unit_price")
+CAR_COLUMNS = ("vin", "make", "model", "year", "owner_name", "owner_phone")
+
+ImportResult = namedtuple("ImportResult", "created updated skipped errors")
+
+
+class CsvFormatError(Exception):
+    pass
+
+
+def _int(value, field, minimum=None):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{field}: не е цяло число ({value!r})")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{field}: трябва да е поне {minimum}")
+    return number
+
+
+def _float(value, field):
+    try:
+        number = float(value.replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{field}: не е число ({value!r})")
+    if number < 0:
+        raise ValueError(f"{field}: не може да е отрицателно")
+    return number
+
+
+def _clean_part(raw, columns):
+    row = {}
+    part_number = (raw.get("part_number") or "").strip()
+    if not part_number:
+        raise ValueError("part_number: задължително поле")
+    row["part_number"] = part_number[:80]
+    if "name" in columns:
+        name = (raw.get("name") or "").strip()
+        if not name:
+            raise ValueError("name: задължително поле")
+        row["name"] = name[:120]
+    if "description" in columns:
+        row["description"] = (raw.get("description") or "").strip() or None
+    if "quantity" in columns:
+        value = (raw.get("quantity") or "").strip()
+        row["quantity"] = _int(value, "quantity", minimum=0) if value else 0
+    if "unit_price" in columns:
+        value = (raw.get("unit_price") or "").strip()
+        row["unit_price"] = _float(value, "unit_price") if value else 0.0
+    return row
+
+
+def _clean_car(raw, columns):
+    row = {}
+    vin = (raw.get("vin") or "").strip()
+    if not vin:
+        raise ValueError("vin: задължително поле")
+    row["vin"] = vin[:50]
+    for field, limit in (("make", 80), ("model", 80), ("owner_name", 120), ("owner_phone", 50)):
+        if field in columns:
+            row[field] = (raw.get(field) or "").strip()[:limit] or None
+    if "year" in columns:
+        value = (raw.get("year") or "").strip()
+        row["year"] = _int(value, "year", minimum=1900) if value else None
+    return row
+
+
+def _read(stream, allowed, required, clean, batch_size, errors):
+    """Yield ``(columns, [(line, row), ...])`` chunks of valid rows."""
+    reader = csv.DictReader(stream)
+    header = [(name or "").strip().lower() for name in (reader.fieldnames or [])]
+    if not set(required) <= set(header):
+        raise CsvFormatError(f"липсват колони: {', '.join(sorted(set(required) - set(header)))}")
+    reader.fieldnames = header
+    columns = [c for c in allowed if c in header]
+
+    chunk = []
+    try:
+        for raw in reader:
+            line = reader.line_num
+            try:
+                chunk.append((line, clean(raw, columns)))
+            except ValueError as exc:
+                errors.append((line, str(exc)))
+            if len(chunk) >= batch_size:
+                yield columns, chunk
+                chunk = []
+    except (csv.Error, UnicodeDecodeError) as exc:
+        errors.append((reader.line_num, f"невалиден CSV: {exc}"))
+    if chunk:
+        yield columns, chunk
+
+
+def _last_per_key(chunk, key):
+    # a key repeated inside one chunk would hit ON CONFLICT twice; keep the last
+    rows = {}
+    for line, row in chunk:
+        rows[row[key]] = (line, row)
+    return list(rows.values())
+
+
+def _set_quantities(counts):
+    """Set on-hand quantities from ``(part_id, quantity_read, counted)``; returns the applied deltas.
+
+    Compare-and-set like inventory.adjust_to: a part whose stock moved since
+    it was read (a mechanic took a unit) is re-read and set again, so the
+    booked adjustment is always the change actually made.
+    """
+    table = Part.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("p_id"), func.coalesce(table.c.quantity, 0) == bindparam("p_old"))
+        .values(quantity=bindparam("p_new"))
+    )
+    applied = []
+    for part_id, old, new in counts:
+        while new != old:
+            if db.session.execute(stmt, {"p_id": part_id, "p_old": old, "p_new": new}).rowcount == 1:
+                applied.append((part_id, new - old))
+                break
+            old = db.session.execute(select(func.coalesce(Part.quantity, 0)).where(Part.id == part_id)).scalar()
+    return applied
+
+
+def import_parts(stream, batch_size=1000):
+    """Upsert parts from a CSV text stream. Returns an ImportResult.
+
+    Only ``part_number`` is required in the header; new parts also need a name.
+    """
+    errors = []
+    created = updated = 0
+    for columns, chunk in _read(stream, PART_COLUMNS, ("part_number",), _clean_part, batch_size, errors):
+        lines = _last_per_key(chunk, "part_number")
+        keys = [row["part_number"] for _, row in lines]
+        before = {
+            number: (part_id, quantity or 0) for number, part_id, quantity in db.session.execute(
+                select(Part.part_number, Part.id, Part.quantity).where(Part.part_number.in_(keys))
+            )
+        }
+
+        rows = []
+        for line, row in lines:
+            if row["part_number"] not in before:
+                if "name" not in row:
+                    errors.append((line, "name: задължително за нова част"))
+                    continue
+                row.setdefault("quantity", 0)  # new part without a quantity column
+                row.setdefault("unit_price", 0.0)
+            rows.append(row)
+        if not rows:
+            continue
+        # executemany needs the same keys in every row: new parts may have
+        # gained defaults above, so write new and existing rows separately.
+        # Existing ones get a plain UPDATE - an upsert would still trip the
+        # NOT NULL check on name when the file has no name column - and their
+        # quantity is set separately, by compare-and-set.
+        new_rows = [r for r in rows if r["part_number"] not in before]
+        old_rows = [r for r in rows if r["part_number"] in before]
+        update_columns = [c for c in columns if c not in ("part_number", "quantity")]
+        if new_rows:
+            stmt = sqlite_insert(Part.__table__)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[Part.__table__.c.part_number],
+                set_={c: stmt.excluded[c] for c in new_rows[0] if c != "part_number"},
+            ), new_rows)
+        if old_rows and update_columns:
+            table = Part.__table__
+            db.session.execute(
+                update(table)
+                .where(table.c.part_number == bindparam("key"))
+                .values({c: bindparam(c) for c in update_columns}),
+                [{**{c: r.get(c) for c in update_columns}, "key": r["part_number"]} for r in old_rows],
+            )
+
+        movements = [
+            (part_id, MovementKind.ADJUSTMENT, delta)
+            for part_id, delta in _set_quantities(
+                [before[r["part_number"]] + (r["quantity"],) for r in old_rows if r.get("quantity") is not None]
+            )
+        ]
+        if new_rows:
+            ids = dict(db.session.execute(
+                select(Part.part_number, Part.id).where(Part.part_number.in_([r["part_number"] for r in new_rows]))
+            ).all())
+            movements += [
+                (ids[r["part_number"]], MovementKind.RECEIPT, r["quantity"]) for r in new_rows if r["quantity"]
+            ]
+        inventory.record_many(movements, note="CSV import")
+
+        db.session.commit()
+        created += len(new_rows)
+        updated += len(old_rows)
+
+    lookups.invalidate_parts()
+    return ImportResult(created, updated, len(errors), errors[:MAX_REPORTED_ERRORS])
+
+
+def import_cars(stream, batch_size=1000):
+    """Upsert cars from a CSV text stream. Returns an ImportResult.
+
+    As in the form, an ``owner_name`` that is a username links the car to
+    that client account.
+    """
+    errors = []
+    created = updated = 0
+    for columns, chunk in _read(stream, CAR_COLUMNS, ("vin",), _clean_car, batch_size, errors):
+        rows = [row for _, row in _last_per_key(chunk, "vin")]
+        keys = [row["vin"] for row in rows]
+        existing = set(db.session.execute(select(Car.vin).where(Car.vin.in_(keys))).scalars())
+
+        if "owner_name" in columns:
+            names = {row["owner_name"] for row in rows if row.get("owner_name")}
+            owners = dict(db.session.execute(
+                select(User.username, User.id).where(User.username.in_(names))
+            ).all()) if names else {}
+            for row in rows:
+                row["owner_id"] = owners.get(row.get("owner_name"))
+
+        stmt = sqlite_insert(Car.__table__)
+        update_columns = [c for c in rows[0] if c != "vin"]
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Car.__table__.c.vin],
+                set_={c: stmt.excluded[c] for c in update_columns},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Car.__table__.c.vin])
+        db.session.execute(stmt, rows)
+        db.session.commit()
+        created += len(rows) - len(existing)
+        updated += len(existing)
+
+    return ImportResult(created, updated, len(errors), errors[:MAX_REPORTED_ERRORS])
+
+
+def text_stream(file_storage):
+    """Decode an uploaded file lazily (UTF-8, with or without BOM)."""
+    return io.TextIOWrapper(file_storage.stream, encoding="utf-8-sig", newline="")
+
+
+# -----------------------------
+# EXPORT
+# -----------------------------
+
+def _stream_csv(header, query, chunk_rows=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    rows = db.session.execute(query.execution_options(yield_per=chunk_rows))
+    for n, row in enumerate(rows, start=1):
+        writer.writerow(["" if value is None else value for value in row])
+        if n % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_parts():
+    """Generator of CSV text chunks for all parts (same columns as the import)."""
+    columns = [getattr(Part, c) for c in PART_COLUMNS]
+    return _stream_csv(PART_COLUMNS, select(*columns).order_by(Part.id))
+
+
+def export_cars():
+    columns = [getattr(Car, c) for c in CAR_COLUMNS]
+    return _stream_csv(CAR_COLUMNS, select(*columns).order_by(Car.id))
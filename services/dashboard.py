@@ -0,0 +1,70 @@
+"""Numbers for the manager and mechanic dashboards.
+
+Nothing here counts work orders: order counts come from the
+work_order_counter table (one row per status and mechanic, kept by the
+triggers of migration 9), today's completions from the mechanic_daily
+rollup, and low stock from the parts lookup cache. A dashboard costs the
+same with ten orders or ten million.
+"""
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db, WorkOrderCounter, MechanicDaily, utcnow
+from services import lookups
+
+OrderCounts = namedtuple("OrderCounts", "by_status unassigned queues")
+
+
+def order_counts():
+    """Counts per status, unassigned active orders and active orders per mechanic."""
+    by_status, queues = {}, {}
+    unassigned = 0
+    rows = db.session.execute(
+        select(WorkOrderCounter.status, WorkOrderCounter.mechanic_id, WorkOrderCounter.count)
+        .where(WorkOrderCounter.count != 0)
+    )
+    for status, mechanic_id, count in rows:
+        by_status[status] = by_status.get(status, 0) + count
+        if status == "completed":
+            continue
+        if mechanic_id:
+            queues.setdefault(mechanic_id, {})[status] = count
+        else:
+            unassigned += count
+    return OrderCounts(by_status, unassigned, queues)
+
+
+def completed_today(mechanic_id=None):
+    query = select(func.coalesce(func.sum(MechanicDaily.completed), 0)).where(MechanicDaily.day == utcnow().date())
+    if mechanic_id is not None:
+        query = query.where(MechanicDaily.mechanic_id == mechanic_id)
+    return db.session.execute(query).scalar()
+
+
+def manager_summary():
+    counts = order_counts()
+    mechanics = [
+        (m, counts.queues.get(m.id, {})) for m in lookups.mechanic_options()
+    ]
+    # busiest first; mechanics with nothing active stay in the list
+    mechanics.sort(key=lambda item: (-sum(item[1].values()), item[0].username))
+    threshold = current_app.config.get("LOW_STOCK_THRESHOLD", 5)
+    return dict(
+        by_status=counts.by_status,
+        unassigned=counts.unassigned,
+        mechanics=mechanics,
+        completed_today=completed_today(),
+        low_stock=lookups.low_stock_parts(threshold),
+        low_stock_threshold=threshold,
+    )
+
+
+def mechanic_summary(mechanic_id):
+    counts = order_counts()
+    return dict(
+        queue=counts.queues.get(mechanic_id, {}),
+        unassigned=counts.unassigned,
+        completed_today=completed_today(mechanic_id),
+    )
@@ -0,0 +1,31 @@
+"""Idempotency keys for form posts.
+
+The form is rendered with a fresh random key in a hidden field. The first
+POST with that key stores it in the same transaction as the rows it
+creates; a retry or double submit finds it and becomes a cheap no-op. The
+primary key also makes two concurrent submits with the same key collide
+at commit instead of both succeeding.
+"""
+import uuid
+from datetime import timedelta
+
+from models import db, IdempotencyKey, utcnow
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def find(key, user_id):
+    return IdempotencyKey.query.filter_by(key=key, user_id=user_id).first()
+
+
+def remember(key, user_id, work_order_id=None):
+    db.session.add(IdempotencyKey(key=key, user_id=user_id, work_order_id=work_order_id))
+
+
+def prune(max_age_hours):
+    cutoff = utcnow() - timedelta(hours=max_age_hours)
+    removed = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete()
+    db.session.commit()
+    return removed
@@ -0,0 +1,307 @@
+"""Uploaded images: streaming intake, content-addressed storage and derivatives.
+
+Intake: for file fields whose name has an image extension, the request's
+multipart parser writes into an ``IncomingImage`` instead of Werkzeug's
+default temp file. It hashes the bytes, sniffs the magic number and
+enforces MAX_IMAGE_BYTES per file while the body is still arriving, on
+disk under UPLOAD_TMP_FOLDER (outside static/, so partial files are never
+served). An oversized file is discarded as soon as it
+crosses the limit and ``save_upload`` raises ImageTooLarge for it, so the
+view skips that one file instead of the whole request failing with 413.
+
+Storage: originals are stored once per content hash under
+``uploads/blobs/<aa>/<sha256>.<ext>`` (a rename of the intake file), so the
+same photo uploaded twice is kept once and every row references the same
+path.
+
+Derivatives: sized WebP variants under ``uploads/variants/<name>/`` are
+what list pages show. They are generated by a small thread pool after the
+response, not inside the request. Pillow is optional: without it
+templates fall back to the original files.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Request, current_app, url_for
+from werkzeug.utils import secure_filename
+
+from services import metrics
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+
+# name -> bounding box in pixels (about 2x the CSS size, for dense screens)
+DEFAULT_VARIANTS = {
+    "card": (640, 400),
+    "thumb": (200, 200),
+}
+
+# leading bytes -> canonical extension; the stored file gets the sniffed one
+MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+]
+MAGIC_LENGTH = 12
+
+
+class UnsupportedImage(Exception):
+    pass
+
+
+class ImageTooLarge(UnsupportedImage):
+    pass
+
+
+def init_app(app):
+    app.request_class = UploadRequest
+    app.jinja_env.globals.update(image_url=image_url)
+
+
+def _variants():
+    return current_app.config.get("IMAGE_VARIANTS") or DEFAULT_VARIANTS
+
+
+def upload_path(rel):
+    """Filesystem path of an ``uploads/...`` path (UPLOAD_FOLDER is static/uploads)."""
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], *rel.split("/")[1:])
+
+
+def _extension(filename):
+    filename = secure_filename(filename or "")
+    return filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+
+
+def _is_image_name(filename):
+    ext = _extension(filename)
+    return bool(ext) and ext in current_app.config.get("ALLOWED_IMAGE_EXTENSIONS", set())
+
+
+def sniff(head):
+    """Image type from the first bytes of a file, or None."""
+    for magic, ext in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+# -----------------------------
+# INTAKE (while the body streams in)
+# -----------------------------
+
+class IncomingImage:
+    """Write-through temp file that hashes, sniffs and size-checks each chunk."""
+
+    def __init__(self, tmp_dir, max_bytes):
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.kind = None
+        self.claimed = False
+        self.duplicate = False
+        self.too_large = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.too_large:
+            return len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            # drop what we have and swallow the rest; save_upload reports it
+            self.too_large = True
+            self._file.seek(0)
+            self._file.truncate()
+            metrics.record_upload("rejected")
+            return len(data)
+        if len(self._head) < MAGIC_LENGTH:
+            self._head += data[:MAGIC_LENGTH]
+            self.kind = sniff(self._head)
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def claim(self, final_path):
+        """Move the finished upload to its permanent place (durably)."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        if os.path.exists(final_path):
+            os.remove(self.path)  # duplicate upload: keep the stored copy
+            os.utime(final_path)  # and restart upload_gc's grace period for it
+            self.duplicate = True
+        else:
+            os.replace(self.path, final_path)
+        self.claimed = True
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.claimed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read/seek/tell/... for Werkzeug's FileStorage
+        return getattr(self._file, name)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if _is_image_name(filename):
+            return IncomingImage(
+                current_app.config["UPLOAD_TMP_FOLDER"],
+                current_app.config.get("MAX_IMAGE_BYTES"),
+            )
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def save_upload(file_storage):
+    """Store an uploaded image by content hash and return its path under static/.
+
+    Raises UnsupportedImage when the name or the content is not an allowed
+    image, ImageTooLarge above MAX_IMAGE_BYTES.
+    """
+    if not _is_image_name(file_storage.filename):
+        metrics.record_upload("rejected")
+        raise UnsupportedImage(file_storage.filename)
+
+    incoming = file_storage.stream
+    if not isinstance(incoming, IncomingImage):
+        # not parsed by UploadRequest (e.g. built by hand): copy it through one
+        incoming = IncomingImage(
+            current_app.config["UPLOAD_TMP_FOLDER"],
+            current_app.config.get("MAX_IMAGE_BYTES"),
+        )
+        while not incoming.too_large:
+            chunk = file_storage.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            incoming.write(chunk)
+
+    try:
+        if incoming.too_large:
+            raise ImageTooLarge(file_storage.filename)
+        if incoming.kind is None or incoming.kind not in current_app.config.get("ALLOWED_IMAGE_EXTENSIONS", set()):
+            metrics.record_upload("rejected")
+            raise UnsupportedImage(file_storage.filename)
+        rel = _blob_rel(incoming.hexdigest(), incoming.kind)
+        incoming.claim(upload_path(rel))
+    finally:
+        incoming.close()
+    metrics.record_upload("duplicate" if incoming.duplicate else "stored", incoming.size)
+    return rel
+
+
+def _blob_rel(digest, ext):
+    return f"uploads/blobs/{digest[:2]}/{digest}.{ext}"
+
+
+# -----------------------------
+# DERIVATIVES
+# -----------------------------
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def process_async(rel):
+    """Generate variants for ``rel`` off the request (IMAGE_WORKERS threads).
+
+    With IMAGE_WORKERS=0 the work is done inline, which scripts and tests
+    can rely on.
+    """
+    workers = current_app.config.get("IMAGE_WORKERS", 2)
+    if not workers:
+        generate_variants(rel)
+        return None
+    app = current_app._get_current_object()
+    return _get_executor(workers).submit(_generate_in_context, app, rel)
+
+
+def _get_executor(workers):
+    global _executor, _executor_pid
+    with _executor_lock:
+        # one pool per process; recreated after a fork
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _generate_in_context(app, rel):
+    with app.app_context():
+        return generate_variants(rel)
+
+
+def variant_rel(rel, name):
+    """Path under static/ of the ``name`` variant of the image at ``rel``."""
+    stem = os.path.splitext(os.path.basename(rel))[0]
+    if not rel.startswith("uploads/blobs/"):
+        # legacy per-id uploads: key the variant on the path instead
+        stem = hashlib.sha256(rel.encode("utf-8")).hexdigest()
+    return f"uploads/variants/{name}/{stem[:2]}/{stem}.webp"
+
+
+def generate_variants(rel, overwrite=False):
+    """Create the missing WebP variants of an uploaded image. Returns how many were written."""
+    if Image is None or not rel or not rel.startswith("uploads/"):
+        return 0
+    source = upload_path(rel)
+    if not os.path.exists(source):
+        return 0
+
+    written = 0
+    quality = current_app.config.get("IMAGE_WEBP_QUALITY", 80)
+    try:
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ("RGB", "RGBA"):
+                original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+            for name, size in _variants().items():
+                target = upload_path(variant_rel(rel, name))
+                if os.path.exists(target) and not overwrite:
+                    continue
+                img = original.copy()
+                img.thumbnail(size)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp = f"{target}.{threading.get_ident()}.tmp"
+                img.save(tmp, "WEBP", quality=quality, method=4)
+                os.replace(tmp, target)
+                written += 1
+    except (OSError, ValueError) as exc:
+        # not a decodable image: templates keep serving the original
+        current_app.logger.warning("image variants failed for %s: %s", rel, exc)
+    return written
+
+
+def image_url(rel, variant=None):
+    """URL of an image, preferring the ``variant`` derivative when it exists."""
+    if not rel:
+        return None
+    if variant and rel.startswith("uploads/"):
+        candidate = variant_rel(rel, variant)
+        if os.path.exists(upload_path(candidate)):
+            return url_for("static", filename=candidate)
+    return url_for("static", filename=rel)
@@ -0,0 +1,151 @@
+"""Opt-in per-request SQL instrumentation (SQL_INSTRUMENTATION=1).
+
+For a sampled share of requests (SQL_INSTRUMENTATION_SAMPLE_RATE) it
+records query count, DB time, template render time and the slowest
+statements, using SQLAlchemy cursor events and Flask request hooks:
+
+- ``Server-Timing`` header (db, render, total) for the browser dev tools;
+- statements repeated NPLUSONE_THRESHOLD+ times in one request are
+  reported as probable N+1 (same SQL text, different parameters);
+- slow or N+1 requests go to the ``car_service.slow_requests`` logger,
+  and to SLOW_REQUEST_LOG when that file is set.
+
+Nothing is attached when it is off. Unsampled requests cost one ``g``
+lookup per query.
+"""
+import heapq
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+log = logging.getLogger("car_service.slow_requests")
+
+SLOWEST_KEPT = 5
+
+
+class RequestStats:
+    __slots__ = ("started", "queries", "db_ms", "render_ms", "statements", "slowest", "_render_started")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.statements = Counter()
+        self.slowest = []  # min-heap of (ms, statement), SLOWEST_KEPT long
+        self._render_started = []
+
+    def add_query(self, statement, ms):
+        self.queries += 1
+        self.db_ms += ms
+        self.statements[statement] += 1
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (ms, statement))
+        elif ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (ms, statement))
+
+    def repeated(self, threshold):
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def current_stats():
+    """Stats of the current request, or None when it is not sampled."""
+    if not has_app_context():
+        return None
+    return g.get("_sql_stats")
+
+
+def install(app, engine):
+    """Attach the engine and request hooks; run after ``db.init_app(app)``."""
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return
+    sample_rate = app.config.get("SQL_INSTRUMENTATION_SAMPLE_RATE", 1.0)
+    slow_ms = app.config.get("SLOW_REQUEST_MS", 500)
+    threshold = app.config.get("NPLUSONE_THRESHOLD", 5)
+    _add_log_file(app.config.get("SLOW_REQUEST_LOG"))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_stats() is not None:
+            context._instrumentation_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_instrumentation_started", None)
+        stats = current_stats()
+        if started is not None and stats is not None:
+            stats.add_query(statement, (time.perf_counter() - started) * 1000)
+
+    def render_started(sender, template, context, **extra):
+        stats = current_stats()
+        if stats is not None:
+            stats._render_started.append(time.perf_counter())
+
+    def render_finished(sender, template, context, **extra):
+        stats = current_stats()
+        if stats is not None and stats._render_started:
+            elapsed = (time.perf_counter() - stats._render_started.pop()) * 1000
+            if not stats._render_started:  # nested renders count once
+                stats.render_ms += elapsed
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+    @app.before_request
+    def start_sample():
+        if sample_rate >= 1 or random.random() < sample_rate:
+            g._sql_stats = RequestStats()
+
+    @app.after_request
+    def finish_sample(response):
+        stats = g.pop("_sql_stats", None)
+        if stats is None:
+            return response
+        total_ms = stats.total_ms()
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", '
+            f"render;dur={stats.render_ms:.1f}, total;dur={total_ms:.1f}",
+        )
+        repeated = stats.repeated(threshold)
+        if total_ms >= slow_ms or repeated:
+            _log_request(stats, total_ms, repeated, response.status_code)
+        return response
+
+
+def _log_request(stats, total_ms, repeated, status):
+    lines = [
+        f"{request.method} {request.full_path.rstrip('?')} ({request.endpoint}) -> {status}: "
+        f"{total_ms:.1f} ms, {stats.queries} queries in {stats.db_ms:.1f} ms, render {stats.render_ms:.1f} ms"
+    ]
+    for ms, statement in sorted(stats.slowest, reverse=True):
+        lines.append(f"  slow {ms:.1f} ms: {_one_line(statement)}")
+    for statement, count in repeated:
+        lines.append(f"  probable N+1, {count}x: {_one_line(statement)}")
+    log.warning("\n".join(lines))
+
+
+def _one_line(statement, limit=300):
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def _add_log_file(path):
+    if not path:
+        return
+    path = os.path.abspath(path)
+    log.setLevel(logging.INFO)
+    for handler in log.handlers:
+        if getattr(handler, "baseFilename", None) == path:
+            return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    log.addHandler(handler)
@@ -0,0 +1,235 @@
+"""Stock changes for parts.
+
+Quantities are changed with a single conditional UPDATE instead of
+read-check-write in Python, so concurrent mechanics cannot both take the
+last unit (no lost updates) and no lock is held across the request.
+
+Every change is also appended to the StockMovement ledger and folded into
+the PartStockDaily rollup in the same transaction, so history queries read
+one row per part and day instead of scanning movements.
+
+Callers own the transaction: they commit on success and roll back on
+``InsufficientStock``.
+"""
+from datetime import timedelta
+
+from sqlalchemy import bindparam, insert, update, select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Part, WorkOrderPart, StockMovement, PartStockDaily, MovementKind, utcnow
+from services import reporting
+
+_ROLLUP_COLUMN = {
+    MovementKind.RECEIPT: "received",
+    MovementKind.CONSUMPTION: "consumed",
+    MovementKind.ADJUSTMENT: "adjusted",
+}
+
+
+class InsufficientStock(Exception):
+    def __init__(self, part_id, quantity):
+        super().__init__(f"part {part_id}: fewer than {quantity} in stock")
+        self.part_id = part_id
+        self.quantity = quantity
+
+
+def record(part_id, kind, delta, work_order_id=None, note=None):
+    """Append a movement and update the daily rollup; Part.quantity is untouched.
+
+    Use directly only for quantities that are already applied (a new part's
+    initial stock, reconciliation); otherwise use receive/consume/adjust_to.
+    """
+    now = utcnow()
+    db.session.add(StockMovement(
+        part_id=part_id, kind=kind, quantity=delta,
+        work_order_id=work_order_id, note=note, created_at=now,
+    ))
+
+    column = _ROLLUP_COLUMN[kind]
+    amount = -delta if kind == MovementKind.CONSUMPTION else delta
+    table = PartStockDaily.__table__
+    closing = select(Part.quantity).where(Part.id == part_id).scalar_subquery()
+    stmt = sqlite_insert(table).values(part_id=part_id, day=now.date(), closing=closing, **{column: amount})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.part_id, table.c.day],
+        set_={column: table.c[column] + amount, "closing": closing},
+    )
+    db.session.execute(stmt)
+
+
+def record_many(movements, note=None):
+    """Bulk ``record`` for imports: ``(part_id, kind, delta)`` tuples, already applied.
+
+    One multi-row INSERT for the ledger and one executemany upsert for the
+    rollup, instead of two statements per part.
+    """
+    if not movements:
+        return
+    now = utcnow()
+    db.session.execute(insert(StockMovement), [
+        {"part_id": part_id, "kind": kind, "quantity": delta, "note": note, "created_at": now}
+        for part_id, kind, delta in movements
+    ])
+
+    table = PartStockDaily.__table__
+    closing = select(Part.quantity).where(Part.id == bindparam("p_id")).scalar_subquery()
+    stmt = sqlite_insert(table).values(
+        part_id=bindparam("p_id"), day=now.date(), closing=closing,
+        received=bindparam("p_received"), consumed=bindparam("p_consumed"), adjusted=bindparam("p_adjusted"),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.part_id, table.c.day],
+        set_={
+            "received": table.c.received + stmt.excluded.received,
+            "consumed": table.c.consumed + stmt.excluded.consumed,
+            "adjusted": table.c.adjusted + stmt.excluded.adjusted,
+            "closing": stmt.excluded.closing,
+        },
+    )
+    rows = []
+    for part_id, kind, delta in movements:
+        amounts = {"received": 0, "consumed": 0, "adjusted": 0}
+        amounts[_ROLLUP_COLUMN[kind]] = -delta if kind == MovementKind.CONSUMPTION else delta
+        rows.append({"p_id": part_id, **{f"p_{k}": v for k, v in amounts.items()}})
+    db.session.execute(stmt, rows)
+
+
+def consume(order_id, part_id, quantity):
+    """Take ``quantity`` units of a part for a work order."""
+    result = db.session.execute(
+        update(Part)
+        .where(Part.id == part_id, Part.quantity >= quantity)
+        .values(quantity=Part.quantity - quantity)
+    )
+    if result.rowcount != 1:
+        raise InsufficientStock(part_id, quantity)
+
+    line = WorkOrderPart(work_order_id=order_id, part_id=part_id, quantity_used=quantity)
+    db.session.add(line)
+    record(part_id, MovementKind.CONSUMPTION, -quantity, work_order_id=order_id)
+    reporting.part_used(part_id, quantity)
+    return line
+
+
+def consume_many(order_id, lines):
+    """Book several ``(part_id, quantity)`` lines; all or nothing once rolled back.
+
+    Lines for the same part are merged so each part is updated once.
+    """
+    totals = {}
+    for part_id, quantity in lines:
+        totals[part_id] = totals.get(part_id, 0) + quantity
+    return [consume(order_id, part_id, totals[part_id]) for part_id in sorted(totals)]
+
+
+def receive(part_id, quantity, note=None):
+    """Add delivered stock."""
+    db.session.execute(
+        update(Part)
+        .where(Part.id == part_id)
+        .values(quantity=func.coalesce(Part.quantity, 0) + quantity)
+    )
+    record(part_id, MovementKind.RECEIPT, quantity, note=note)
+
+
+def adjust_to(part_id, counted, note=None):
+    """Set the on-hand quantity to a physical count, booking the difference."""
+    while True:
+        current = db.session.execute(select(Part.quantity).where(Part.id == part_id)).scalar() or 0
+        delta = counted - current
+        if not delta:
+            return 0
+        # compare-and-set: retry if stock moved between the read and the write
+        result = db.session.execute(
+            update(Part)
+            .where(Part.id == part_id, func.coalesce(Part.quantity, 0) == current)
+            .values(quantity=counted)
+        )
+        if result.rowcount == 1:
+            record(part_id, MovementKind.ADJUSTMENT, delta, note=note)
+            return delta
+
+
+def retire_part(part_id):
+    """Book the stock of a part that is being deleted down to zero.
+
+    Its movements and rollup rows stay: the ledger is append-only and keeps
+    the history of deleted parts (part_id is not a foreign key).
+    """
+    return adjust_to(part_id, 0, note="part deleted")
+
+
+# -----------------------------
+# READS (served from the rollup)
+# -----------------------------
+
+def stock_history(part_id, days=30):
+    """Daily received/consumed/adjusted/closing rows for the last ``days`` days."""
+    since = utcnow().date() - timedelta(days=days)
+    return (
+        PartStockDaily.query
+        .filter(PartStockDaily.part_id == part_id, PartStockDaily.day >= since)
+        .order_by(PartStockDaily.day.desc())
+        .all()
+    )
+
+
+# -----------------------------
+# RECONCILIATION
+# -----------------------------
+
+def reconcile(fix=False):
+    """Compare Part.quantity with the ledger and the rollup.
+
+    Returns a list of ``(part_id, on_hand, ledger_total, rollup_total)`` for
+    parts that disagree. With ``fix=True`` the ledger is brought in line with
+    the on-hand quantity by a reconciliation adjustment, and the part's
+    rollup is rebuilt from its movements.
+    """
+    ledger = dict(
+        db.session.query(StockMovement.part_id, func.sum(StockMovement.quantity))
+        .group_by(StockMovement.part_id)
+    )
+    rollup = dict(
+        db.session.query(
+            PartStockDaily.part_id,
+            func.sum(PartStockDaily.received - PartStockDaily.consumed + PartStockDaily.adjusted),
+        ).group_by(PartStockDaily.part_id)
+    )
+    mismatches = []
+    for part_id, on_hand in db.session.query(Part.id, Part.quantity):
+        on_hand = on_hand or 0
+        ledger_total = ledger.get(part_id) or 0
+        rollup_total = rollup.get(part_id) or 0
+        if on_hand != ledger_total or ledger_total != rollup_total:
+            mismatches.append((part_id, on_hand, ledger_total, rollup_total))
+
+    if fix:
+        for part_id, on_hand, ledger_total, _ in mismatches:
+            if on_hand != ledger_total:
+                db.session.add(StockMovement(
+                    part_id=part_id, kind=MovementKind.ADJUSTMENT,
+                    quantity=on_hand - ledger_total, note="reconciliation",
+                ))
+            db.session.flush()
+            _rebuild_rollup(part_id)
+        db.session.commit()
+    return mismatches
+
+
+def _rebuild_rollup(part_id):
+    PartStockDaily.query.filter_by(part_id=part_id).delete()
+    running = 0
+    days = {}
+    movements = StockMovement.query.filter_by(part_id=part_id).order_by(StockMovement.id)
+    for m in movements:
+        row = days.get(m.created_at.date())
+        if row is None:
+            row = days[m.created_at.date()] = PartStockDaily(
+                part_id=part_id, day=m.created_at.date(), received=0, consumed=0, adjusted=0,
+            )
+        column = _ROLLUP_COLUMN[m.kind]
+        setattr(row, column, getattr(row, column) + (-m.quantity if m.kind == MovementKind.CONSUMPTION else m.quantity))
+        running += m.quantity
+        row.closing = running
+    db.session.add_all(days.values())
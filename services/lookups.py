@@ -0,0 +1,111 @@
+from collections import namedtuple
+
+from flask import get_template_attribute
+from flask_login import UserMixin
+
+from models import Part, User, Role
+from services.cache import VersionedCache
+
+# Plain tuples instead of ORM rows: they are shared between requests and
+# must not be bound to (or refreshed by) any one session.
+PartOption = namedtuple("PartOption", "id name quantity")
+MechanicOption = namedtuple("MechanicOption", "id username")
+
+
+class SessionUser(UserMixin):
+    """What ``current_user`` needs, detached from any session (see ``session_user``)."""
+    __slots__ = ("id", "username", "role")
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def __repr__(self):
+        return f"<SessionUser {self.username}>"
+
+PARTS = "parts"
+USERS = "users"
+
+cache = VersionedCache()
+# one entry per logged-in user, so sized separately from the lookups above
+user_cache = VersionedCache(max_entries=1024, ttl=60)
+
+
+def init_app(app):
+    cache.configure(
+        max_entries=app.config.get("LOOKUP_CACHE_MAX_ENTRIES"),
+        ttl=app.config.get("LOOKUP_CACHE_TTL"),
+    )
+    user_cache.configure(
+        max_entries=app.config.get("USER_CACHE_MAX_ENTRIES"),
+        ttl=app.config.get("USER_CACHE_TTL"),
+    )
+    app.jinja_env.globals.update(
+        parts_options_template=parts_options_template,
+        mechanics_options_template=mechanics_options_template,
+    )
+
+
+def part_options():
+    def load():
+        rows = Part.query.with_entities(Part.id, Part.name, Part.quantity).order_by(Part.name).all()
+        return tuple(PartOption(*r) for r in rows)
+    return cache.get_or_load(PARTS, "options", load)
+
+
+def mechanic_options():
+    def load():
+        rows = (
+            User.query.with_entities(User.id, User.username)
+            .filter_by(role=Role.MECHANIC)
+            .order_by(User.username)
+            .all()
+        )
+        return tuple(MechanicOption(*r) for r in rows)
+    return cache.get_or_load(USERS, "mechanics", load)
+
+
+def low_stock_parts(threshold):
+    """Parts with ``quantity <= threshold``, lowest first; derived from the cached options."""
+    def load():
+        low = [p for p in part_options() if (p.quantity or 0) <= threshold]
+        return tuple(sorted(low, key=lambda p: (p.quantity or 0, p.name)))
+    return cache.get_or_load(PARTS, ("low_stock", threshold), load)
+
+
+def parts_options_template():
+    """Rendered <template> with the part options, cached per inventory version."""
+    return cache.get_or_load(
+        PARTS, "options_html",
+        lambda: get_template_attribute("_options.html", "parts_template")(part_options()),
+    )
+
+
+def mechanics_options_template():
+    return cache.get_or_load(
+        USERS, "mechanics_html",
+        lambda: get_template_attribute("_options.html", "mechanics_template")(mechanic_options()),
+    )
+
+
+def invalidate_parts():
+    """Call after committing anything that changes a part or its quantity."""
+    cache.bump(PARTS)
+
+
+def session_user(user_id):
+    """The user behind a login session, or None; at most one query per TTL.
+
+    Used by the login manager's user loader on every request.
+    """
+    def load():
+        row = User.query.with_entities(User.id, User.username, User.role).filter_by(id=user_id).first()
+        return SessionUser(*row) if row else None
+    return user_cache.get_or_load(USERS, user_id, load)
+
+
+def invalidate_users():
+    """Call after committing a new, changed or removed user."""
+    cache.bump(USERS)
+    user_cache.bump(USERS)
@@ -0,0 +1,164 @@
+"""Prometheus metrics for ``/metrics`` (METRICS_ENABLED=1, needs prometheus_client).
+
+- request latency histogram and request counter per endpoint
+  (``cars.list_cars``, ``auth.login``, ...; unmatched URLs count as one);
+- DB pool checkouts, checkout wait time and checkout timeouts;
+- upload counts (stored / duplicate / rejected) and bytes;
+- hits, misses and evictions of the in-process caches (hit ratio is
+  ``rate(hits) / (rate(hits) + rate(misses))``).
+
+With several worker processes set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before starting them: every process then writes its samples to
+mmap'ed files there and ``/metrics`` sums them up, whichever worker serves
+it. All metrics here are counters and histograms, which that mode
+aggregates without any cleanup when a worker exits.
+"""
+import os
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+    )
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    Counter = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> VersionedCache; their counters are copied into Prometheus after each request
+_caches = {}
+_cache_seen = {}
+_sync_lock = threading.Lock()
+
+if Counter is not None:
+    REQUEST_LATENCY = Histogram(
+        "carservice_http_request_duration_seconds", "Request latency by endpoint.",
+        ["endpoint", "method"], buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS = Counter(
+        "carservice_http_requests_total", "Requests by endpoint and status.", ["endpoint", "method", "status"],
+    )
+    POOL_CHECKOUTS = Counter("carservice_db_pool_checkouts_total", "Connections checked out of the pool.")
+    POOL_WAIT = Histogram(
+        "carservice_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+        buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+    )
+    POOL_TIMEOUTS = Counter("carservice_db_pool_checkout_timeouts_total", "Pool checkouts that timed out.")
+    POOL_CONNECTS = Counter("carservice_db_pool_connections_opened_total", "New DBAPI connections opened.")
+    UPLOADS = Counter("carservice_uploads_total", "Image uploads by outcome.", ["outcome"])
+    UPLOAD_BYTES = Counter("carservice_upload_bytes_total", "Bytes of accepted image uploads.")
+    CACHE_HITS = Counter("carservice_cache_hits_total", "In-process cache hits.", ["cache"])
+    CACHE_MISSES = Counter("carservice_cache_misses_total", "In-process cache misses.", ["cache"])
+    CACHE_EVICTIONS = Counter("carservice_cache_evictions_total", "In-process cache evictions.", ["cache"])
+
+
+def is_enabled():
+    return has_app_context() and current_app.extensions.get("metrics", False)
+
+
+def init_app(app, engine):
+    """Install request and pool hooks; run after ``db.init_app(app)``."""
+    if not app.config.get("METRICS_ENABLED"):
+        return
+    if Counter is None:
+        app.logger.warning("METRICS_ENABLED ignored: prometheus_client is not installed")
+        return
+    app.extensions["metrics"] = True
+
+    from services import lookups
+    watch_cache("lookups", lookups.cache)
+    watch_cache("users", lookups.user_cache)
+
+    _instrument_pool(engine)
+
+    @app.before_request
+    def start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+            REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        _sync_caches()
+        return response
+
+
+def _instrument_pool(engine):
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_conn, record, proxy):
+        POOL_CHECKOUTS.inc()
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_conn, record):
+        POOL_CONNECTS.inc()
+
+    # the pool has no "before checkout" event, so time connect() itself
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        except PoolTimeout:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def watch_cache(name, cache):
+    """Export a VersionedCache's hit/miss/eviction counters as ``cache=name``."""
+    _caches[name] = cache
+    _cache_seen.setdefault(name, (0, 0, 0))
+
+
+def _sync_caches():
+    # the caches keep plain ints; copy the increase since the last sync.
+    # Whoever holds the lock syncs for everyone, the others skip it.
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        for name, cache in _caches.items():
+            current = (cache.hits, cache.misses, cache.evictions)
+            seen = _cache_seen[name]
+            if current == seen:
+                continue
+            _cache_seen[name] = current
+            for counter, now, before in zip((CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS), current, seen):
+                if now > before:
+                    counter.labels(name).inc(now - before)
+    finally:
+        _sync_lock.release()
+
+
+def record_upload(outcome, size=0):
+    """Count an image upload: outcome is "stored", "duplicate" or "rejected"."""
+    if not is_enabled():
+        return
+    UPLOADS.labels(outcome).inc()
+    if size and outcome != "rejected":
+        UPLOAD_BYTES.inc(size)
+
+
+def render():
+    """(body, content type) of the metrics exposition for this process or all workers."""
+    _sync_caches()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,58 @@
+"""Password hashing with configurable cost, rehash-on-login and login throttling.
+
+PASSWORD_HASH_METHOD is any Werkzeug method string ("scrypt",
+"scrypt:16384:8:1", "pbkdf2:sha256:260000", ...). New hashes use it, and a
+successful login whose stored hash was made with other parameters is
+rehashed on the spot, so changing the setting migrates users as they log in.
+
+``login_wait`` is checked before any hashing: every attempt takes a token
+from its IP's and its username's bucket (services/throttle.py), so a burst
+of guesses is refused with 429 instead of costing a hash each.
+"""
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from services import throttle
+
+DEFAULT_METHOD = "scrypt"
+
+
+def init_app(app):
+    if app.config.get("LOGIN_THROTTLE", True):
+        app.extensions["login_throttle"] = (
+            throttle.TokenBuckets(app.config["LOGIN_IP_BURST"], app.config["LOGIN_IP_PER_MINUTE"]),
+            throttle.TokenBuckets(app.config["LOGIN_USER_BURST"], app.config["LOGIN_USER_PER_MINUTE"]),
+        )
+
+
+def _method():
+    return current_app.config.get("PASSWORD_HASH_METHOD") or DEFAULT_METHOD
+
+
+@lru_cache(maxsize=8)
+def _prefix(method):
+    # "scrypt" is stored as "scrypt:32768:8:1": hash once to learn the full form
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def hash_password(password):
+    return generate_password_hash(password, _method())
+
+
+def verify(stored_hash, password):
+    return check_password_hash(stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    return stored_hash.split("$", 1)[0] != _prefix(_method())
+
+
+def login_wait(ip, username):
+    """0 if this login attempt may go ahead, else seconds to wait (nothing hashed yet)."""
+    buckets = current_app.extensions.get("login_throttle")
+    if not buckets:
+        return 0
+    by_ip, by_user = buckets
+    return throttle.take([(by_ip, ip or "-"), (by_user, username.lower())])
@@ -0,0 +1,276 @@
+"""Daily reporting rollups: part usage and revenue, completions, open-order age.
+
+Reports never walk WorkOrder / WorkOrderPart. Small rollup tables are kept
+up to date in the writer's transaction instead (like the stock rollup in
+services/inventory.py), and the report queries sum a few rows per day:
+
+- part_usage_daily / part_usage_monthly: ``part_used`` from
+  inventory.consume, valued at the part's unit price at that moment. Long
+  ranges read whole months from the monthly table and only the partial
+  months at either end from the daily one (the per-day revenue series,
+  at most DAILY_SERIES_MAX_DAYS long, always reads the daily table);
+- mechanic_daily: ``order_changed`` counts an order on its completed_at
+  day for its mechanic, and takes it back when the order is reopened;
+- open_order_daily: ``order_created`` / ``order_changed`` keep the number
+  of not completed orders per creation day, so the age histogram is one
+  row per day, not per order.
+
+Archiving and car deletion only remove completed orders; their usage and
+completions stay in the rollups as history. ``rebuild``
+(``flask --app app backfill-reports``) recomputes them all from the orders
+and the stock ledger.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from sqlalchemy import and_, delete, distinct, func, or_, select, text, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import (
+    db, Part, User, PartUsageDaily, PartUsageMonthly, MechanicDaily, OpenOrderDaily, utcnow,
+)
+
+OrderState = namedtuple("OrderState", "status mechanic_id created_at completed_at")
+
+# (upper bound in days or None, label) for open_order_age
+AGE_BUCKETS = [
+    (1, "до 1 ден"),
+    (7, "2–7 дни"),
+    (30, "8–30 дни"),
+    (90, "31–90 дни"),
+    (None, "над 90 дни"),
+]
+
+# longer ranges are shown per month
+DAILY_SERIES_MAX_DAYS = 92
+
+
+def _bump(model, key, column, amount, **extra):
+    """Add ``amount`` (and ``extra`` column increments) to the row at ``key``."""
+    table = model.__table__
+    stmt = sqlite_insert(table).values(**key, **{column: amount}, **extra)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key],
+        set_={name: table.c[name] + stmt.excluded[name] for name in (column, *extra)},
+    )
+    db.session.execute(stmt)
+
+
+# -----------------------------
+# WRITE HOOKS (caller commits)
+# -----------------------------
+
+def part_used(part_id, quantity):
+    today = utcnow().date()
+    price = select(func.coalesce(Part.unit_price, 0)).where(Part.id == part_id).scalar_subquery()
+    _bump(PartUsageDaily, {"day": today, "part_id": part_id},
+          "quantity", quantity, revenue=price * quantity)
+    _bump(PartUsageMonthly, {"month": today.replace(day=1), "part_id": part_id},
+          "quantity", quantity, revenue=price * quantity)
+
+
+def order_state(order):
+    """Snapshot to pass to ``order_changed`` after changing the order."""
+    return OrderState(order.status, order.mechanic_id, order.created_at, order.completed_at)
+
+
+def _is_open(state):
+    return state.status != "completed"
+
+
+def _completion(state):
+    if state.status == "completed" and state.mechanic_id and state.completed_at:
+        return state.completed_at.date(), state.mechanic_id
+    return None
+
+
+def order_created(order):
+    """A new order (flushed, so created_at is set)."""
+    if order.created_at and _is_open(order_state(order)):
+        _bump(OpenOrderDaily, {"day": order.created_at.date()}, "open_count", 1)
+
+
+def order_changed(before, order):
+    """Status, mechanic or completed_at of ``order`` changed since ``before``."""
+    after = order_state(order)
+    if before.created_at and _is_open(before) != _is_open(after):
+        _bump(OpenOrderDaily, {"day": before.created_at.date()}, "open_count", 1 if _is_open(after) else -1)
+
+    old, new = _completion(before), _completion(after)
+    if old != new:
+        if old:
+            _bump(MechanicDaily, {"day": old[0], "mechanic_id": old[1]}, "completed", -1)
+        if new:
+            _bump(MechanicDaily, {"day": new[0], "mechanic_id": new[1]}, "completed", 1)
+
+
+# -----------------------------
+# BACKFILL
+# -----------------------------
+
+# Part usage comes from the consumption ledger, or from the order's dates
+# for lines booked before the ledger existed; it is valued at today's price.
+REBUILD_STATEMENTS = [
+    """INSERT INTO part_usage_daily (day, part_id, quantity, revenue)
+       SELECT day, part_id, SUM(qty), SUM(qty * price) FROM (
+           SELECT date(m.created_at) AS day, m.part_id, -m.quantity AS qty,
+                  COALESCE(p.unit_price, 0) AS price
+           FROM stock_movement m LEFT JOIN part p ON p.id = m.part_id
+           WHERE m.kind = 'consumption'
+           UNION ALL
+           SELECT date(COALESCE(o.completed_at, o.created_at)), l.part_id, l.quantity_used,
+                  COALESCE(p.unit_price, 0)
+           FROM work_order_part_history l
+           JOIN work_order_history o ON o.id = l.work_order_id
+           LEFT JOIN part p ON p.id = l.part_id
+           WHERE NOT EXISTS (
+               SELECT 1 FROM stock_movement m
+               WHERE m.work_order_id = l.work_order_id AND m.part_id = l.part_id
+                 AND m.kind = 'consumption')
+       ) GROUP BY day, part_id""",
+    """INSERT INTO part_usage_monthly (month, part_id, quantity, revenue)
+       SELECT strftime('%Y-%m-01', day), part_id, SUM(quantity), SUM(revenue)
+       FROM part_usage_daily GROUP BY 1, 2""",
+    """INSERT INTO mechanic_daily (day, mechanic_id, completed)
+       SELECT date(completed_at), mechanic_id, COUNT(*) FROM work_order_history
+       WHERE status = 'completed' AND mechanic_id IS NOT NULL AND completed_at IS NOT NULL
+       GROUP BY 1, 2""",
+    """INSERT INTO open_order_daily (day, open_count)
+       SELECT date(created_at), COUNT(*) FROM work_order
+       WHERE COALESCE(status, 'open') != 'completed' AND created_at IS NOT NULL
+       GROUP BY 1""",
+]
+
+
+ROLLUPS = (PartUsageDaily, PartUsageMonthly, MechanicDaily, OpenOrderDaily)
+
+
+def rebuild():
+    """Recompute all rollups from the source tables in one transaction."""
+    for model in ROLLUPS:
+        db.session.execute(delete(model))
+    for sql in REBUILD_STATEMENTS:
+        db.session.execute(text(sql))
+    db.session.commit()
+    return {
+        model.__tablename__: db.session.execute(select(func.count()).select_from(model)).scalar()
+        for model in ROLLUPS
+    }
+
+
+# -----------------------------
+# READS
+# -----------------------------
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _usage(start, end):
+    """Part usage rows (day, part_id, quantity, revenue) covering ``start <= day <= end``.
+
+    Whole months inside the range come from part_usage_monthly (dated the
+    1st), the days before and after them from part_usage_daily.
+    """
+    first = start if start.day == 1 else _next_month(start)
+    stop = _next_month(end) if _next_month(end) == end + timedelta(days=1) else end.replace(day=1)
+    columns = (PartUsageDaily.part_id, PartUsageDaily.quantity, PartUsageDaily.revenue)
+    if first >= stop:
+        return select(PartUsageDaily.day, *columns).where(
+            PartUsageDaily.day >= start, PartUsageDaily.day <= end
+        ).subquery()
+    daily = select(PartUsageDaily.day, *columns).where(or_(
+        and_(PartUsageDaily.day >= start, PartUsageDaily.day < first),
+        and_(PartUsageDaily.day >= stop, PartUsageDaily.day <= end),
+    ))
+    monthly = select(
+        PartUsageMonthly.month, PartUsageMonthly.part_id, PartUsageMonthly.quantity, PartUsageMonthly.revenue,
+    ).where(PartUsageMonthly.month >= first, PartUsageMonthly.month < stop)
+    return union_all(daily, monthly).subquery()
+
+
+def part_usage(start, end, limit=50):
+    """Top parts by revenue over ``start <= day <= end``: (part_id, part_number, name, quantity, revenue)."""
+    rows = _usage(start, end)
+    usage = (
+        select(
+            rows.c.part_id,
+            func.sum(rows.c.quantity).label("quantity"),
+            func.sum(rows.c.revenue).label("revenue"),
+        )
+        .group_by(rows.c.part_id)
+        .having(func.sum(rows.c.quantity) != 0)
+        .order_by(func.sum(rows.c.revenue).desc())
+        .limit(limit)
+        .subquery()
+    )
+    return db.session.execute(
+        select(usage.c.part_id, Part.part_number, Part.name, usage.c.quantity, usage.c.revenue)
+        .outerjoin(Part, Part.id == usage.c.part_id)
+        .order_by(usage.c.revenue.desc())
+    ).all()
+
+
+def usage_totals(start, end):
+    """(units, revenue) over the range."""
+    rows = _usage(start, end)
+    quantity, revenue = db.session.execute(select(func.sum(rows.c.quantity), func.sum(rows.c.revenue))).one()
+    return quantity or 0, revenue or 0.0
+
+
+def revenue_series(start, end):
+    """(period, units, revenue) per day, or per month for long ranges."""
+    if (end - start).days < DAILY_SERIES_MAX_DAYS:
+        # per day needs the daily rows; _usage would fold whole months into their 1st
+        rows = select(PartUsageDaily).where(PartUsageDaily.day >= start, PartUsageDaily.day <= end).subquery()
+        period = rows.c.day
+    else:
+        rows = _usage(start, end)
+        period = func.strftime("%Y-%m", rows.c.day)
+    return db.session.execute(
+        select(period, func.sum(rows.c.quantity), func.sum(rows.c.revenue))
+        .group_by(period)
+        .order_by(period)
+    ).all()
+
+
+def mechanic_completions(start, end):
+    """(mechanic_id, username, completed, active_days) over the range, most completed first."""
+    totals = (
+        select(
+            MechanicDaily.mechanic_id,
+            func.sum(MechanicDaily.completed).label("completed"),
+            func.count(distinct(MechanicDaily.day)).label("active_days"),
+        )
+        .where(MechanicDaily.day >= start, MechanicDaily.day <= end, MechanicDaily.completed != 0)
+        .group_by(MechanicDaily.mechanic_id)
+        .subquery()
+    )
+    return db.session.execute(
+        select(totals.c.mechanic_id, User.username, totals.c.completed, totals.c.active_days)
+        .outerjoin(User, User.id == totals.c.mechanic_id)
+        .order_by(totals.c.completed.desc(), User.username)
+    ).all()
+
+
+def open_order_age(today=None):
+    """``(buckets, total, oldest_day)``; buckets are (label, count) per AGE_BUCKETS."""
+    today = today or utcnow().date()
+    counts = [0] * len(AGE_BUCKETS)
+    total, oldest = 0, None
+    for day, count in db.session.execute(
+        select(OpenOrderDaily.day, OpenOrderDaily.open_count).where(OpenOrderDaily.open_count > 0)
+    ):
+        age = (today - day).days
+        for i, (limit, _) in enumerate(AGE_BUCKETS):
+            if limit is None or age <= limit:
+                counts[i] += count
+                break
+        total += count
+        oldest = day if oldest is None else min(oldest, day)
+    return [(label, n) for (_, label), n in zip(AGE_BUCKETS, counts)], total, oldest
+
+
+def default_range(days=30):
+    end = utcnow().date()
+    return end - timedelta(days=days - 1), end
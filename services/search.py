@@ -0,0 +1,80 @@
+"""Global search over the FTS5 ``search_index`` table (migration m0007).
+
+The index is maintained by SQLite triggers, so every write path (ORM,
+Core bulk statements, the archive job) keeps it current without code here.
+Rowids encode the source record as ``id * 4 + kind``.
+"""
+import re
+from collections import namedtuple
+
+from markupsafe import Markup
+from sqlalchemy import text
+
+from models import db, Role
+
+PART, WORK_ORDER, CAR = 1, 2, 3
+KINDS = {PART: "part", WORK_ORDER: "work_order", CAR: "car"}
+
+MAX_TERMS = 8
+# snippet() markers; replaced by <mark> after the text is escaped
+_HL_START, _HL_END = "\x02", "\x03"
+
+SearchResult = namedtuple("SearchResult", "kind id title snippet")
+
+
+def match_expression(q):
+    """FTS5 query for free text: every word must match, as a prefix.
+
+    Words are quoted, so user input can never be parsed as FTS5 syntax.
+    """
+    terms = re.findall(r"\w+", q or "")[:MAX_TERMS]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _visibility(user):
+    """Extra WHERE clause (and params) limiting results to what ``user`` may open."""
+    if user.role == Role.MANAGER:
+        return "", {}
+    if user.role == Role.MECHANIC:
+        # same rule as the work orders list: own and unassigned jobs
+        return (
+            f" AND (search_index.rowid % 4 != {WORK_ORDER} OR search_index.rowid IN ("
+            f"SELECT id * 4 + {WORK_ORDER} FROM work_order WHERE mechanic_id = :uid OR mechanic_id IS NULL))",
+            {"uid": user.id},
+        )
+    return (
+        f" AND (search_index.rowid % 4 = {PART}"
+        f" OR search_index.rowid IN (SELECT id * 4 + {WORK_ORDER} FROM work_order WHERE client_id = :uid)"
+        f" OR search_index.rowid IN (SELECT id * 4 + {CAR} FROM car WHERE owner_id = :uid))",
+        {"uid": user.id},
+    )
+
+
+def _highlight(snippet):
+    escaped = Markup.escape(snippet)
+    return escaped.replace(_HL_START, Markup("<mark>")).replace(_HL_END, Markup("</mark>"))
+
+
+def search(q, user, page=1, page_size=20):
+    """Ranked results for ``q`` visible to ``user``. Returns (results, has_next)."""
+    expression = match_expression(q)
+    if not expression:
+        return [], False
+
+    where, params = _visibility(user)
+    rows = db.session.execute(
+        text(
+            "SELECT search_index.rowid, title, "
+            f"snippet(search_index, -1, '{_HL_START}', '{_HL_END}', '…', 12) "
+            "FROM search_index WHERE search_index MATCH :expression"
+            + where
+            + " ORDER BY rank LIMIT :limit OFFSET :offset"
+        ),
+        dict(params, expression=expression, limit=page_size + 1, offset=(page - 1) * page_size),
+    ).all()
+
+    results = [
+        SearchResult(KINDS[rowid % 4], rowid // 4, title, _highlight(snippet))
+        for rowid, title, snippet in rows[:page_size]
+    ]
+    return results, len(rows) > page_size
@@ -0,0 +1,81 @@
+"""Opt-in SQLite tuning for several concurrent workers (SQLITE_PRODUCTION=1).
+
+- WAL journal: readers no longer block the writer and vice versa.
+- Per-connection pragmas (busy_timeout, synchronous, mmap_size, cache_size)
+  applied from an engine "connect" event.
+- Explicit BEGIN, write lock taken lazily: every transaction starts as a
+  deferred (read) one. Just before its first write statement it is ended
+  and reopened with BEGIN IMMEDIATE on the same connection, so writers
+  queue on busy_timeout instead of failing with "database is locked" when
+  upgrading a read lock - and slow work before the first write (password
+  hashing, saving uploads) never holds the database-wide write lock.
+  Rows read before that point come from the earlier snapshot; stock and
+  other contended updates are conditional UPDATEs, so they do not rely on it.
+- Explicit pool sizing instead of SQLAlchemy's defaults.
+"""
+from sqlalchemy import event
+
+# statements that run inside the read transaction; anything else takes the write lock
+READ_STATEMENTS = ("SELECT", "WITH", "PRAGMA", "EXPLAIN")
+
+
+def is_enabled(app):
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI") or ""
+    return app.config.get("SQLITE_PRODUCTION") and uri.startswith("sqlite:///")
+
+
+def configure(app):
+    """Set engine options; must run before ``db.init_app(app)``."""
+    if not is_enabled(app):
+        return
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    options.setdefault("pool_size", app.config["SQLITE_POOL_SIZE"])
+    options.setdefault("max_overflow", app.config["SQLITE_POOL_OVERFLOW"])
+    options.setdefault("pool_timeout", app.config["SQLITE_POOL_TIMEOUT"])
+    connect_args = dict(options.get("connect_args") or {})
+    # pysqlite's own timeout doubles as busy_timeout; we emit BEGIN ourselves
+    connect_args.setdefault("timeout", app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000)
+    connect_args.setdefault("check_same_thread", False)
+    connect_args["isolation_level"] = None
+    options["connect_args"] = connect_args
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def install(app, engine):
+    """Attach pragma and BEGIN handlers; run after ``db.init_app(app)``."""
+    if not is_enabled(app):
+        return
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(app.config['SQLITE_CACHE_SIZE'])}",
+        "PRAGMA foreign_keys=ON",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin(conn):
+        conn.info["sqlite_txn"] = None  # not for the BEGIN itself
+        conn.exec_driver_sql("BEGIN")
+        conn.info["sqlite_txn"] = "read"
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def take_write_lock(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("sqlite_txn") != "read":
+            return
+        words = statement.split(None, 1)
+        if words and words[0].upper() in READ_STATEMENTS:
+            return
+        conn.info["sqlite_txn"] = "write"
+        # a deferred transaction cannot wait for the lock, so start over as IMMEDIATE
+        cursor.execute("COMMIT")
+        cursor.execute("BEGIN IMMEDIATE")
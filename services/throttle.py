@@ -0,0 +1,57 @@
+"""In-memory token buckets for throttling (used by the login view).
+
+Each key (an IP address, a username, ...) has a bucket of ``burst`` tokens
+that refills at ``per_minute`` tokens a minute; an attempt takes one token
+from every bucket it is checked against, or from none if any is empty.
+Buckets live in this process only, so with N workers the effective limit
+is up to N times higher - still enough to keep a password-guessing burst
+from occupying every worker with hashing.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    """Buckets for many keys, bounded to ``max_keys`` (least recently used go first)."""
+
+    def __init__(self, burst, per_minute, max_keys=10000):
+        if burst < 1 or per_minute <= 0:
+            # a bucket that never refills would lock a key out for good
+            raise ValueError(f"token bucket needs burst >= 1 and per_minute > 0, got {burst} and {per_minute}")
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+
+    def level(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def wait(self, tokens):
+        """Seconds until a bucket at ``tokens`` holds a whole token again."""
+        return (1 - tokens) / self.rate
+
+    def store(self, key, tokens, now):
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # a forgotten key only means a full bucket again
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+_lock = threading.Lock()
+
+
+def take(checks):
+    """Take a token for every ``(buckets, key)`` pair, all or nothing.
+
+    Returns 0 when allowed, otherwise the seconds until it would be.
+    """
+    now = time.monotonic()
+    with _lock:
+        levels = [(buckets, key, buckets.level(key, now)) for buckets, key in checks]
+        empty = [buckets.wait(tokens) for buckets, _, tokens in levels if tokens < 1]
+        for buckets, key, tokens in levels:
+            buckets.store(key, tokens if empty else tokens - 1, now)
+    return max(empty) if empty else 0
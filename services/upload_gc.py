@@ -0,0 +1,213 @@
+"""Garbage collection of upload files that no row references any more.
+
+Deleting cars, parts or orders leaves their files under static/uploads.
+``collect`` walks the upload tree in a stable (sorted, depth-first) order
+and checks files against Car.image_filename, Part.image_filename and
+WorkOrderImage.filename (hot and archived) one batch at a time with
+``IN (...)`` lookups, so memory stays flat on large trees. Its position is
+saved in a small JSON state file after every batch: a run can stop after
+``max_files`` and the next one resumes where it left off.
+
+Variants are orphans when no row references their source image. Files younger than
+the grace period are never touched; an upload is written to disk before
+the row that references it is committed. Interrupted uploads left in
+UPLOAD_TMP_FOLDER (``*.part``, outside the upload tree) are never
+referenced, so each full pass also removes those older than the grace
+period.
+"""
+import json
+import os
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, Car, Part, WorkOrderImage, WorkOrderImageArchive
+from services import images
+
+# extensions save_upload can give a blob (the sniffed type)
+STORED_EXTENSIONS = sorted({ext for _, ext in images.MAGIC_NUMBERS} | {"webp"})
+
+REFERENCE_COLUMNS = (
+    Car.image_filename,
+    Part.image_filename,
+    WorkOrderImage.filename,
+    WorkOrderImageArchive.filename,
+)
+
+
+def _state_path():
+    return current_app.config["UPLOAD_GC_STATE_FILE"]
+
+
+def load_state():
+    try:
+        with open(_state_path(), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    tmp = _state_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+    os.replace(tmp, _state_path())
+
+
+def walk(root, after=None):
+    """Yield ``uploads/...`` paths below ``root`` in sorted order, strictly after ``after``."""
+    after_parts = tuple(after.split("/")[1:]) if after else ()
+
+    def visit(directory, prefix):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            parts = prefix + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                # descend only into directories that can hold paths > cursor
+                if parts >= after_parts[:len(parts)]:
+                    yield from visit(entry.path, parts)
+            elif parts > after_parts:
+                yield "/".join(("uploads",) + parts), entry
+
+    yield from visit(root, ())
+
+
+def _referenced(paths):
+    found = set()
+    for column in REFERENCE_COLUMNS:
+        found.update(p for (p,) in db.session.execute(select(column).where(column.in_(paths)).distinct()))
+    return found
+
+
+def _legacy_variant_paths():
+    """Variant paths of referenced uploads outside the content-addressed store."""
+    paths = set()
+    for column in REFERENCE_COLUMNS:
+        legacy = db.session.execute(
+            select(column).where(column.like("uploads/%"), column.notlike("uploads/blobs/%")).distinct()
+        )
+        for (rel,) in legacy:
+            paths.update(images.variant_rel(rel, name) for name in images._variants())
+    return paths
+
+
+def _blob_candidates(variant):
+    """Blob paths a content-addressed variant could have been made from."""
+    stem = os.path.basename(variant).split(".", 1)[0]  # also covers stale "<stem>.webp.<tid>.tmp"
+    return [images._blob_rel(stem, ext) for ext in STORED_EXTENSIONS]
+
+
+def collect(delete=False, batch_size=500, max_files=None, pause=0.0, grace_seconds=3600,
+            restart=False, log=None):
+    """Scan (part of) the upload tree; returns a summary dict.
+
+    ``delete=False`` only reports what would be reclaimed. ``pause`` sleeps
+    between batches to leave I/O and the database to the web workers.
+    """
+    root = current_app.config["UPLOAD_FOLDER"]
+    state = {} if restart else load_state()
+    cursor = state.get("cursor")
+    now = time.time()
+    if not cursor:
+        state = {"scanned": 0, "orphans": 0, "orphan_bytes": 0, "deleted": 0}
+        _sweep_tmp(state, now, grace_seconds, delete)
+
+    legacy_variants = _legacy_variant_paths()
+    seen_this_run = 0
+    batch = []
+
+    def flush(batch):
+        lookup = []
+        for rel, _ in batch:
+            lookup.extend(_blob_candidates(rel) if rel.startswith("uploads/variants/") else [rel])
+        referenced = _referenced(lookup)
+        for rel, entry in batch:
+            if rel.startswith("uploads/variants/"):
+                orphan = rel not in legacy_variants and referenced.isdisjoint(_blob_candidates(rel))
+            else:
+                orphan = rel not in referenced
+            if not orphan:
+                continue
+            size = entry.stat().st_size
+            state["orphans"] += 1
+            state["orphan_bytes"] += size
+            if delete:
+                try:
+                    os.remove(entry.path)
+                    state["deleted"] += 1
+                    _prune_empty_dirs(os.path.dirname(entry.path), root)
+                except OSError:
+                    pass
+        state["cursor"] = batch[-1][0]
+        _save_state(state)
+        if log:
+            log(f"scanned {state['scanned']} file(s), {state['orphans']} orphan(s), "
+                f"{state['orphan_bytes']} byte(s) reclaimable, cursor {state['cursor']}")
+
+    finished = True
+    for rel, entry in walk(root, cursor):
+        if max_files is not None and seen_this_run >= max_files:
+            finished = False
+            break
+        seen_this_run += 1
+        state["scanned"] += 1
+        try:
+            if now - entry.stat().st_mtime < grace_seconds:
+                continue
+        except OSError:
+            continue
+        batch.append((rel, entry))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+            if pause:
+                time.sleep(pause)
+    if batch:
+        flush(batch)
+
+    summary = dict(state, finished=finished)
+    if finished:
+        # full pass done: the next run starts from the top
+        state["cursor"] = None
+        _save_state(state)
+    return summary
+
+
+def _sweep_tmp(state, now, grace_seconds, delete):
+    """Count (and remove) stale ``*.part`` files of interrupted uploads."""
+    try:
+        entries = list(os.scandir(current_app.config["UPLOAD_TMP_FOLDER"]))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.name.endswith(".part") or not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if now - stat.st_mtime < grace_seconds:
+            continue
+        state["orphans"] += 1
+        state["orphan_bytes"] += stat.st_size
+        if delete:
+            try:
+                os.remove(entry.path)
+                state["deleted"] += 1
+            except OSError:
+                pass
+
+
+def _prune_empty_dirs(directory, root):
+    root = os.path.abspath(root)
+    directory = os.path.abspath(directory)
+    while directory != root and directory.startswith(root):
+        try:
+            os.rmdir(directory)  # only succeeds when empty
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
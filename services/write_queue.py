@@ -0,0 +1,131 @@
+"""Optional in-process write queue (WRITE_QUEUE_ENABLED=1).
+
+Short write transactions are handed to one writer thread per process,
+which runs up to WRITE_QUEUE_MAX_BATCH of them inside a single transaction
+(one savepoint each) and commits once. With SQLite that turns many small
+fsyncs and lock hand-offs into one.
+
+Jobs run in the writer's own session: pass ids, not ORM objects from the
+request session. ``run`` waits at most WRITE_QUEUE_TIMEOUT seconds and then
+raises WriteTimeout; the job stays queued and may still commit, so callers
+must treat that as "outcome unknown", not as a failed write.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from models import db
+from services import sqlite_profile
+
+
+class WriteTimeout(TimeoutError):
+    """The job did not finish in time; it may still be applied later."""
+
+
+class WriteQueue:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_batch = 32
+        self.max_delay = 0.005
+        self.timeout = 10
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = bool(app.config.get("WRITE_QUEUE_ENABLED"))
+        uri = app.config.get("SQLALCHEMY_DATABASE_URI") or ""
+        if self.enabled and uri.startswith("sqlite") and not sqlite_profile.is_enabled(app):
+            # pysqlite's default transaction handling breaks SAVEPOINTs
+            app.logger.warning("WRITE_QUEUE_ENABLED ignored: SQLite needs SQLITE_PRODUCTION=1")
+            self.enabled = False
+        self.max_batch = app.config.get("WRITE_QUEUE_MAX_BATCH", self.max_batch)
+        self.max_delay = app.config.get("WRITE_QUEUE_MAX_DELAY_MS", 5) / 1000
+        self.timeout = app.config.get("WRITE_QUEUE_TIMEOUT", self.timeout)
+
+    def run(self, fn, *args, **kwargs):
+        """Run ``fn`` in a committed write transaction and return its result.
+
+        Raises WriteTimeout when the queue does not get to it in time.
+        """
+        if not self.enabled:
+            result = fn(*args, **kwargs)
+            db.session.commit()
+            return result
+
+        # release the request's own transaction (and any write lock) first
+        db.session.commit()
+        try:
+            return self.submit(fn, *args, **kwargs).result(self.timeout)
+        except FutureTimeout:
+            raise WriteTimeout(f"write still pending after {self.timeout}s") from None
+
+    def submit(self, fn, *args, **kwargs):
+        self._ensure_worker()
+        future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        return future
+
+    def _ensure_worker(self):
+        # started lazily (and again after a fork) so preforked workers get one
+        with self._lock:
+            if self._pid != os.getpid():
+                # jobs queued in the parent belong to the parent's requests
+                self._jobs = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                # a dead writer is replaced on the same queue: queued jobs still run
+                self._thread = threading.Thread(target=self._loop, name="write-queue", daemon=True)
+                self._thread.start()
+
+    def _take_batch(self):
+        batch = [self._jobs.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            with self.app.app_context():
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        done = []
+        try:
+            for future, fn, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        result = fn(*args, **kwargs)
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    done.append((future, result))
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            for future, _ in done:
+                future.set_exception(exc)
+            return
+        finally:
+            db.session.remove()
+        for future, result in done:
+            future.set_result(result)
+
+
+writes = WriteQueue()
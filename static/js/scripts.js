@@ -75,6 +75,18 @@
     });
   }
 
+  function initSharedOptions(){
+    // <select data-options="id"> takes its <option>s from <template id="id">,
+    // so a list used by many rows is only sent and rendered once per page
+    document.querySelectorAll('select[data-options]').forEach(function(sel){
+      var tpl = document.getElementById(sel.getAttribute('data-options'));
+      if(!tpl) return;
+      sel.appendChild(tpl.content.cloneNode(true));
+      var selected = sel.getAttribute('data-selected');
+      if(selected) sel.value = selected;
+    });
+  }
+
   function animateEntrance(){
     // add fade-in-up to visible cards
     var items = document.querySelectorAll('.card, tbody tr, .role-card');
@@ -89,6 +101,7 @@
     initAutoDismissAlerts();
     initNavActive();
     initSearch();
+    initSharedOptions();
     animateEntrance();
 
     // Tooltips
@@ -0,0 +1,110 @@
+"""Login throughput per CPU core for different password hash settings.
+
+    python tools/bench_login.py
+    python tools/bench_login.py --methods scrypt scrypt:16384:8:1 pbkdf2:sha256:260000 --seconds 5
+
+For every PASSWORD_HASH_METHOD given it builds the app against a temporary
+SQLite file with one user, then posts successful logins through the Flask
+test client for --seconds in one process (one core) and reports logins/s
+and the time spent in the hash alone. With --processes N the same loop
+runs in N processes at once, to see how it scales across cores.
+
+The last line times attempts refused by the login throttle, which return
+before any hashing.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import db, User, Role  # noqa: E402
+
+import migrations  # noqa: E402
+from services import passwords  # noqa: E402
+
+DEFAULT_METHODS = ["scrypt", "scrypt:16384:8:1", "pbkdf2:sha256:600000", "pbkdf2:sha256:260000"]
+PASSWORD = "bench-password"
+
+
+def build_app(tmp, method, throttle=False):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "login.db"),
+        "UPLOAD_FOLDER": os.path.join(tmp, "uploads"),
+        "UPLOAD_TMP_FOLDER": os.path.join(tmp, "upload_tmp"),
+        "TESTING": True,
+        "PASSWORD_HASH_METHOD": method,
+        "LOGIN_THROTTLE": throttle,
+    })
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        if not User.query.filter_by(username="bench").first():
+            db.session.add(User(username="bench", password_hash=passwords.hash_password(PASSWORD), role=Role.CLIENT))
+            db.session.commit()
+    return app
+
+
+def login_loop(app, seconds, password=PASSWORD):
+    """(attempts, elapsed, statuses) of login POSTs for ``seconds``."""
+    statuses = {}
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        response = app.test_client().post("/login", data={"username": "bench", "password": password})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        count += 1
+    return count, time.perf_counter() - started, statuses
+
+
+def hash_ms(app, samples=5):
+    with app.app_context():
+        stored = User.query.filter_by(username="bench").one().password_hash
+    started = time.perf_counter()
+    for _ in range(samples):
+        passwords.verify(stored, PASSWORD)
+    return (time.perf_counter() - started) / samples * 1000
+
+
+def worker(args):
+    method, seconds = args
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp, method)
+        count, elapsed, statuses = login_loop(app, seconds)
+    return count, elapsed, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS, help="PASSWORD_HASH_METHOD values.")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration per method.")
+    parser.add_argument("--processes", type=int, default=1, help="Parallel processes (cores) per method.")
+    args = parser.parse_args()
+
+    print(f"{'method':26} {'hash ms':>8} {'logins/s/core':>14} {'ms/login':>9} {'total/s':>8}")
+    for method in args.methods:
+        with tempfile.TemporaryDirectory() as tmp:
+            single = hash_ms(build_app(tmp, method))
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(worker, [(method, args.seconds)] * args.processes)
+        failed = sum(n for r in results for status, n in r[2].items() if status != 302)
+        per_core = sum(count / elapsed for count, elapsed, _ in results) / len(results)
+        total = sum(count / elapsed for count, elapsed, _ in results)
+        line = f"{method:26} {single:8.1f} {per_core:14.1f} {1000 / per_core:9.1f} {total:8.1f}"
+        print(line + (f"  ({failed} not 302)" if failed else ""))
+
+    # refused attempts: a wrong password until the username bucket is empty, then only 429s
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp, args.methods[0], throttle=True)
+        count, elapsed, statuses = login_loop(app, min(args.seconds, 1.0), password="wrong")
+    refused = statuses.get(429, 0)
+    print(f"{'throttled (429)':26} {'-':>8} {count / elapsed:14.1f} {elapsed / count * 1000:9.2f}"
+          f"  ({refused} of {count} refused)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Per-route micro-benchmark with the Flask test client.
+
+    python tools/bench_routes.py                     # check against the baseline
+    python tools/bench_routes.py --update-baseline   # after an intended change
+
+Builds the app against a temporary SQLite file filled by seed_bulk.seed()
+with fixed sizes (FIXTURE), then times each route in ROUTES in-process and
+counts its SQL statements (via services/instrumentation.py's Server-Timing
+header). Everything is compared with tools/bench_baseline.json:
+
+- query count: any increase fails (it does not depend on the machine);
+- median latency: fails above baseline * (1 + --tolerance).
+
+Exit status 1 on a regression, so it can run in CI.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+sys.path.insert(0, TOOLS_DIR)
+
+from sqlalchemy import text  # noqa: E402
+
+import migrations  # noqa: E402
+import seed_bulk  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+BASELINE = os.path.join(TOOLS_DIR, "bench_baseline.json")
+
+FIXTURE = ["--cars", "2000", "--orders", "20000", "--parts", "500",
+           "--clients", "200", "--mechanics", "10", "--seed", "7"]
+
+# name -> (user, method, path, form data, iterations)
+ROUTES = {
+    "list_cars": ("admin", "GET", "/cars/", None, 50),
+    "list_parts": ("admin", "GET", "/parts/", None, 30),
+    "list_work_orders": ("admin", "GET", "/work-orders/", None, 50),
+    "view_order": ("admin", "GET", "/work-orders/view/{order_id}", None, 100),
+    "car_details": ("admin", "GET", "/cars/{car_id}", None, 100),
+    "client_work_orders": ("lt-client-1", "GET", "/work-orders/", None, 50),
+    "mechanic_work_orders": ("lt-mechanic-1", "GET", "/work-orders/", None, 50),
+    "manager_dashboard": ("admin", "GET", "/", None, 100),
+    "mechanic_dashboard": ("lt-mechanic-1", "GET", "/", None, 100),
+    # mostly password hashing
+    "login": (None, "POST", "/login", {"username": "lt-client-1", "password": "loadtest"}, 10),
+}
+PASSWORDS = {"admin": "admin123"}
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def build_app(tmp):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+        "UPLOAD_FOLDER": os.path.join(tmp, "uploads"),
+        "UPLOAD_TMP_FOLDER": os.path.join(tmp, "upload_tmp"),
+        "TESTING": True,
+        "SQL_INSTRUMENTATION": True,
+        "SQL_INSTRUMENTATION_SAMPLE_RATE": 1.0,
+        # counted here, not logged
+        "SLOW_REQUEST_MS": 10 ** 9,
+        "NPLUSONE_THRESHOLD": 10 ** 9,
+        # the login route is timed, not rate limited
+        "LOGIN_THROTTLE": False,
+    })
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        from blueprints.auth import create_default_users
+        create_default_users()
+        with contextlib.redirect_stdout(io.StringIO()):
+            args = seed_bulk.parse_args(FIXTURE)
+            seed_bulk.seed(args, random.Random(args.seed), "BENCH")
+    return app
+
+
+def client_for(app, username):
+    client = app.test_client()
+    if username:
+        response = client.post("/login", data={
+            "username": username, "password": PASSWORDS.get(username, "loadtest"),
+        })
+        if response.status_code != 302:
+            raise SystemExit(f"cannot log in as {username}")
+    return client
+
+
+def bench(app, name, spec, ids):
+    username, method, path, data, iterations = spec
+    client = client_for(app, username)
+    path = path.format(**ids)
+    timings, queries = [], None
+
+    for i in range(iterations + 1):  # the first request warms caches and is not timed
+        if method == "POST" and username is None:
+            client = app.test_client()  # fresh session for every login
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise SystemExit(f"{name}: HTTP {response.status_code} for {method} {path}")
+        match = QUERIES.search(response.headers.get("Server-Timing", ""))
+        if i:
+            timings.append(elapsed)
+            queries = int(match.group(1)) if match else None
+
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1], 3),
+        "queries": queries,
+    }
+
+
+def check(results, baseline, tolerance):
+    failures = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["queries"] is not None and base.get("queries") is not None \
+                and result["queries"] > base["queries"]:
+            failures.append(f"{name}: {result['queries']} queries, baseline {base['queries']}")
+        limit = base["median_ms"] * (1 + tolerance)
+        if result["median_ms"] > limit:
+            failures.append(f"{name}: median {result['median_ms']:.2f} ms, baseline "
+                            f"{base['median_ms']:.2f} ms (limit {limit:.2f} ms)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update-baseline", action="store_true", help="Write results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed median slowdown as a fraction of the baseline (default 0.5 = +50%%).")
+    parser.add_argument("--only", nargs="*", help="Route names to run (default: all).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp)
+        with app.app_context():
+            ids = {
+                # an order with parts and a car with orders: the pages with the most to load
+                "order_id": db.session.execute(text(
+                    "SELECT work_order_id FROM work_order_part ORDER BY work_order_id LIMIT 1")).scalar(),
+                "car_id": db.session.execute(text(
+                    "SELECT car_id FROM work_order GROUP BY car_id ORDER BY COUNT(*) DESC, car_id LIMIT 1")).scalar(),
+            }
+        results = {}
+        for name, spec in ROUTES.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = bench(app, name, spec, ids)
+            r = results[name]
+            print(f"{name:22} median {r['median_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  queries {r['queries']}")
+
+    if args.update_baseline:
+        baseline = {}
+        if args.only and os.path.exists(BASELINE):
+            with open(BASELINE, encoding="utf-8") as fh:
+                baseline = json.load(fh)
+        baseline.update(results)
+        with open(BASELINE, "w", encoding="utf-8") as fh:
+            json.dump(baseline, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline written to {BASELINE}")
+        return 0
+
+    if not os.path.exists(BASELINE):
+        print("no baseline yet; run with --update-baseline")
+        return 0
+    with open(BASELINE, encoding="utf-8") as fh:
+        failures = check(results, json.load(fh), args.tolerance)
+    for failure in failures:
+        print("REGRESSION", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
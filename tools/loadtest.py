@@ -0,0 +1,270 @@
+"""Concurrent role-based load test against a running server.
+
+    python tools/seed_bulk.py --cars 100000 --orders 1000000   # once
+    gunicorn -w 4 -b 127.0.0.1:5000 wsgi:app
+    python tools/loadtest.py --duration 60 --managers 2 --mechanics 4 --clients 10
+
+Every virtual user is a thread with its own cookie jar, logged in as a
+manager (admin by default) or as one of the lt-mechanic-<n> /
+lt-client-<n> users made by seed_bulk.py. Each user repeats its role's flow
+(lists, detail pages, assign, use part, intake). Per step it reports
+p50/p95/p99 latency, errors and throughput. Redirects are not followed, so
+a POST is timed without the page it redirects to.
+
+Results are written as JSON (tools/results/ by default); pass
+--compare <older.json> to print the p95 change per step.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+ORDER_LINK = re.compile(r"/work-orders/view/(\d+)")
+OPTION_VALUE = re.compile(r'<option value="(\d+)"')
+IDEMPOTENCY_KEY = re.compile(r'name="idempotency_key" value="([0-9a-f]+)"')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, step, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(step, []).append(seconds)
+            if not ok:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, rng, think):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.rng = rng
+        self.think = think
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect,
+        )
+
+    def request(self, step, path, data=None):
+        """Timed request; returns (status, body) or (None, "") on a network error."""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=30) as response:
+                status, text = response.status, response.read().decode("utf-8", "replace")
+        except urllib.error.HTTPError as exc:
+            status, text = exc.code, ""
+        except OSError:
+            status, text = None, ""
+        if step:
+            self.recorder.add(step, time.perf_counter() - started, status is not None and status < 400)
+        if self.think:
+            time.sleep(self.think)
+        return status, text
+
+    def login(self, username, password):
+        status, _ = self.request("login", "/login", {"username": username, "password": password})
+        if status != 302:
+            raise SystemExit(f"login failed for {username} (HTTP {status})")
+
+
+def manager_flow(user, state):
+    _, page = user.request("manager: list work orders", "/work-orders/")
+    orders = ORDER_LINK.findall(page)
+    mechanics = OPTION_VALUE.findall(page)
+    if orders:
+        order = user.rng.choice(orders)
+        user.request("manager: view order", f"/work-orders/view/{order}")
+        if mechanics:
+            user.request("manager: assign mechanic", f"/work-orders/assign/{order}",
+                         {"mechanic_id": user.rng.choice(mechanics)})
+    user.request("manager: list cars", "/cars/")
+    user.request("manager: list parts", "/parts/")
+
+
+def mechanic_flow(user, state):
+    _, page = user.request("mechanic: list work orders", "/work-orders/")
+    orders = ORDER_LINK.findall(page)
+    if not orders:
+        return
+    order = user.rng.choice(orders)
+    _, detail = user.request("mechanic: view order", f"/work-orders/view/{order}")
+    parts = OPTION_VALUE.findall(detail)
+    if parts:
+        user.request("mechanic: use part", f"/work-orders/use_part/{order}",
+                     {"part_id": user.rng.choice(parts), "quantity_used": "1"})
+
+
+def client_flow(user, state):
+    user.request("client: list cars", "/cars/")
+    _, page = user.request("client: list work orders", "/work-orders/")
+    orders = ORDER_LINK.findall(page)
+    if orders:
+        user.request("client: view order", f"/work-orders/view/{user.rng.choice(orders)}")
+    key = IDEMPOTENCY_KEY.search(page)
+    with state["lock"]:
+        state["intakes"] += 1
+        n = state["intakes"]
+    user.request("client: intake", "/work-orders/", {
+        "make": "VW", "model": "Golf", "year": "2012",
+        "vin": f"LOAD{state['run']}{n:08d}",
+        "description": "Натоварващ тест",
+        "idempotency_key": key.group(1) if key else "",
+    })
+
+
+def run_user(flow, user, deadline, state):
+    while time.monotonic() < deadline:
+        flow(user, state)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed):
+    steps = {}
+    for step, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        steps[step] = {
+            "count": len(values),
+            "errors": recorder.errors.get(step, 0),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "throughput_rps": round(len(values) / elapsed, 2),
+        }
+    total = sum(s["count"] for s in steps.values())
+    return {
+        "total_requests": total,
+        "total_errors": sum(s["errors"] for s in steps.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "steps": steps,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result, previous=None):
+    print(f"{'step':34} {'count':>7} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8}")
+    for step, s in result["steps"].items():
+        line = (f"{step:34} {s['count']:7} {s['errors']:5} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} "
+                f"{s['p99_ms']:8.1f} {s['throughput_rps']:8.1f}")
+        old = (previous or {}).get("steps", {}).get(step)
+        if old and old["p95_ms"]:
+            line += f"  p95 {(s['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+.0f}%"
+        print(line)
+    print(f"total {result['total_requests']} requests, {result['total_errors']} errors, "
+          f"{result['throughput_rps']} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run.")
+    parser.add_argument("--managers", type=int, default=2)
+    parser.add_argument("--mechanics", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--manager-user", default="admin")
+    parser.add_argument("--manager-password", default="admin123")
+    parser.add_argument("--password", default="loadtest", help="Password of the seeded lt-* users.")
+    parser.add_argument("--seeded-mechanics", type=int, default=50, help="lt-mechanic-1..N exist.")
+    parser.add_argument("--seeded-clients", type=int, default=20_000, help="lt-client-1..N exist.")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause after every request.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Result file (default tools/results/loadtest-<time>.json).")
+    parser.add_argument("--compare", help="Earlier result file to compare p95 against.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    state = {"lock": threading.Lock(), "intakes": 0, "run": os.urandom(3).hex().upper()}
+    think = args.think_ms / 1000
+
+    users = []
+    mechanic_ids = rng.sample(range(1, args.seeded_mechanics + 1), min(args.mechanics, args.seeded_mechanics))
+    client_ids = rng.sample(range(1, args.seeded_clients + 1), min(args.clients, args.seeded_clients))
+    for _ in range(args.managers):
+        users.append((manager_flow, args.manager_user, args.manager_password))
+    users += [(mechanic_flow, f"lt-mechanic-{n}", args.password) for n in mechanic_ids]
+    users += [(client_flow, f"lt-client-{n}", args.password) for n in client_ids]
+
+    sessions = []
+    for flow, username, password in users:
+        user = VirtualUser(args.base_url, recorder, random.Random(rng.random()), think)
+        user.login(username, password)
+        sessions.append((flow, user))
+    recorder.latencies.pop("login", None)  # sequential warm-up, not part of the run
+
+    print(f"{len(sessions)} virtual users for {args.duration:.0f}s against {args.base_url}")
+    started_at = datetime.now().isoformat(timespec="seconds")
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=run_user, args=(flow, user, deadline, state), daemon=True)
+        for flow, user in sessions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    result = dict(
+        started_at=started_at,
+        base_url=args.base_url,
+        git_commit=git_commit(),
+        elapsed_s=round(elapsed, 2),
+        users={"managers": args.managers, "mechanics": len(mechanic_ids), "clients": len(client_ids)},
+        think_ms=args.think_ms,
+        **summarize(recorder, elapsed),
+    )
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            previous = json.load(fh)
+    print_report(result, previous)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results",
+        f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2, ensure_ascii=False)
+    print(f"results written to {output}")
+    return 1 if result["total_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""Fill a database with synthetic data for load tests.
+
+    flask --app app upgrade-db
+    python tools/seed_bulk.py --cars 100000 --orders 1000000 --parts 10000
+
+Rows go in with multi-row Core INSERTs, one transaction per batch; nothing
+is loaded through the ORM. Run it against a database nobody else writes to:
+new ids are taken as the range SQLite will hand out next - above MAX(id),
+and for the AUTOINCREMENT work order tables above their sqlite_sequence
+high-water mark, which stays ahead of MAX(id) once orders are deleted or
+archived.
+
+Generated users log in with --password (default "loadtest"):
+lt-mechanic-<n> and lt-client-<n>. The same --seed gives the same data,
+apart from a random tag that keeps VINs and part numbers unique per run.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func, insert, select, text  # noqa: E402
+
+from app import create_app, ensure_schema_current  # noqa: E402
+from models import (  # noqa: E402
+    db, User, Role, Car, Part, WorkOrder, WorkOrderPart, StockMovement, PartStockDaily, MovementKind, utcnow,
+)
+from services import passwords, reporting  # noqa: E402
+
+MAKES = {
+    "VW": ["Golf", "Passat", "Polo", "Tiguan"],
+    "Opel": ["Astra", "Corsa", "Insignia"],
+    "Toyota": ["Corolla", "Yaris", "RAV4", "Auris"],
+    "BMW": ["320d", "520d", "X3"],
+    "Skoda": ["Octavia", "Fabia", "Superb"],
+    "Renault": ["Clio", "Megane", "Scenic"],
+    "Ford": ["Focus", "Fiesta", "Mondeo"],
+}
+PART_NAMES = [
+    ("OIL", "Маслен филтър", "Филтър за двигателно масло"),
+    ("AIR", "Въздушен филтър", "Филтър за въздух на двигателя"),
+    ("PAD", "Накладки", "Предни спирачни накладки"),
+    ("DSC", "Спирачен диск", "Вентилиран спирачен диск"),
+    ("PLG", "Запалителна свещ", "Стандартна запалителна свещ"),
+    ("BLT", "Ангренажен ремък", "Комплект ангренажен ремък с ролки"),
+    ("BAT", "Акумулатор", "Акумулатор 12V 70Ah"),
+    ("SHK", "Амортисьор", "Преден газов амортисьор"),
+    ("ALT", "Алтернатор", "Алтернатор 12V 120A"),
+    ("WPR", "Чистачки", "Комплект пера за чистачки"),
+]
+COMPLAINTS = [
+    "Смяна на масло и филтри",
+    "Скърцане при спиране",
+    "Не пали на студено",
+    "Вибрации при висока скорост",
+    "Свети лампа за двигателя",
+    "Годишен технически преглед",
+    "Теч на охладителна течност",
+    "Тракане от предното окачване",
+    "Климатикът не охлажда",
+    "Смяна на ангренажен ремък",
+]
+STATUSES = [("completed", 0.6), ("in_progress", 0.25), ("open", 0.15)]
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_rows(table, rows, batch_size, label):
+    started = time.perf_counter()
+    count = 0
+    for batch in batched(rows, batch_size):
+        with db.engine.begin() as conn:
+            conn.execute(insert(table), batch)
+        count += len(batch)
+        print(f"\r{label}: {count}", end="", flush=True)
+    print(f"\r{label}: {count} in {time.perf_counter() - started:.1f}s")
+    return count
+
+
+def next_id(column):
+    """First id the next INSERT into ``column``'s table gets."""
+    high = db.session.execute(select(func.max(column))).scalar() or 0
+    # AUTOINCREMENT tables never go back below their high-water mark
+    seq = db.session.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = :t"), {"t": column.table.name}
+    ).scalar()
+    return max(high, seq or 0) + 1
+
+
+def seed_users(args, password_hash):
+    existing = set(db.session.execute(select(User.username).where(User.username.like("lt-%"))).scalars())
+    rows = [
+        {"username": f"lt-{role}-{n}", "password_hash": password_hash, "role": role}
+        for role, total in ((Role.MECHANIC, args.mechanics), (Role.CLIENT, args.clients))
+        for n in range(1, total + 1)
+        if f"lt-{role}-{n}" not in existing
+    ]
+    insert_rows(User.__table__, rows, args.batch_size, "users")
+
+    def users(role):
+        return db.session.execute(
+            select(User.id, User.username).where(User.username.like(f"lt-{role}-%")).order_by(User.id)
+        ).all()
+    return [row.id for row in users(Role.MECHANIC)], users(Role.CLIENT)
+
+
+def seed_parts(args, rng, tag):
+    first = next_id(Part.id)
+    now = utcnow()
+    quantities = [rng.randint(50, 5000) for _ in range(args.parts)]
+
+    def parts():
+        for n, quantity in enumerate(quantities):
+            code, name, description = PART_NAMES[n % len(PART_NAMES)]
+            yield {
+                "part_number": f"{code}-{tag}-{n:06d}",
+                "name": f"{name} {n // len(PART_NAMES) + 1}",
+                "description": description,
+                "quantity": quantity,
+                "unit_price": round(rng.uniform(5, 400), 2),
+            }
+    insert_rows(Part.__table__, parts(), args.batch_size, "parts")
+
+    # initial stock goes through the ledger like create_default_parts does
+    insert_rows(StockMovement.__table__, (
+        {"part_id": first + n, "kind": MovementKind.RECEIPT, "quantity": q,
+         "note": "load test seed", "created_at": now}
+        for n, q in enumerate(quantities)
+    ), args.batch_size, "stock movements")
+    insert_rows(PartStockDaily.__table__, (
+        {"part_id": first + n, "day": now.date(), "received": q, "consumed": 0, "adjusted": 0, "closing": q}
+        for n, q in enumerate(quantities)
+    ), args.batch_size, "stock rollups")
+    return list(range(first, first + args.parts))
+
+
+def seed_cars(args, rng, tag, clients):
+    first = next_id(Car.id)
+    makes = list(MAKES)
+
+    def cars():
+        for n in range(args.cars):
+            make = rng.choice(makes)
+            owner_id, owner_name = clients[n % len(clients)]
+            yield {
+                "vin": f"LT{tag}{n:011d}",
+                "make": make,
+                "model": rng.choice(MAKES[make]),
+                "year": rng.randint(1998, 2025),
+                "owner_id": owner_id,
+                "owner_name": owner_name,
+                "owner_phone": "N/A",
+            }
+    insert_rows(Car.__table__, cars(), args.batch_size, "cars")
+    # car n belongs to clients[n % len(clients)]
+    return first
+
+
+def seed_orders(args, rng, first_car, clients, mechanics, parts):
+    first = next_id(WorkOrder.id)
+    now = utcnow()
+    statuses, weights = zip(*STATUSES)
+    plan = []  # status per order, needed again for the parts pass
+
+    def orders():
+        for _ in range(args.orders):
+            car_n = rng.randrange(args.cars)
+            status = rng.choices(statuses, weights)[0]
+            created = now - timedelta(minutes=rng.randrange(args.days * 24 * 60))
+            mechanic = rng.choice(mechanics) if mechanics and status != "open" else None
+            plan.append(status)
+            yield {
+                "car_id": first_car + car_n,
+                "client_id": clients[car_n % len(clients)][0],
+                "mechanic_id": mechanic,
+                "status": status,
+                "description": rng.choice(COMPLAINTS),
+                "created_at": created,
+                "completed_at": created + timedelta(hours=rng.randint(1, 96)) if status == "completed" else None,
+            }
+    insert_rows(WorkOrder.__table__, orders(), args.batch_size, "work orders")
+
+    def lines():
+        for n, status in enumerate(plan):
+            if status == "open" or not parts:
+                continue
+            for _ in range(rng.randint(0, args.max_parts_per_order)):
+                yield {"work_order_id": first + n, "part_id": rng.choice(parts), "quantity_used": rng.randint(1, 4)}
+    insert_rows(WorkOrderPart.__table__, lines(), args.batch_size, "work order parts")
+
+
+def seed(args, rng, tag):
+    """Insert everything ``args`` asks for (inside an app context)."""
+    mechanics, clients = seed_users(args, passwords.hash_password(args.password))
+    parts = seed_parts(args, rng, tag)
+    first_car = seed_cars(args, rng, tag, clients)
+    seed_orders(args, rng, first_car, clients, mechanics, parts)
+    # the rows above bypass the app, so its reporting rollups are rebuilt
+    started = time.perf_counter()
+    reporting.rebuild()
+    print(f"report rollups in {time.perf_counter() - started:.1f}s")
+    with db.engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cars", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--parts", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=20_000)
+    parser.add_argument("--mechanics", type=int, default=50)
+    parser.add_argument("--max-parts-per-order", type=int, default=3)
+    parser.add_argument("--days", type=int, default=730, help="Spread order dates over this many days.")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if args.clients < 1:
+        parser.error("--clients must be at least 1")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    app = create_app()
+    ensure_schema_current(app)
+    rng = random.Random(args.seed)
+    tag = os.urandom(2).hex().upper()
+
+    with app.app_context():
+        @event.listens_for(db.engine, "connect")
+        def fast_bulk_load(dbapi_conn, _record):
+            # synthetic data: losing the last batches on a crash is fine
+            dbapi_conn.execute("PRAGMA synchronous=OFF")
+        db.engine.dispose()
+
+        started = time.perf_counter()
+        seed(args, rng, tag)
+        print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""WSGI entry point for production servers, e.g.
+
+    flask --app app upgrade-db          # once per deploy
+    gunicorn -w 4 -b 0.0.0.0:8000 wsgi:app
+"""
+from app import create_app, ensure_schema_current
+
+app = create_app()
+ensure_schema_current(app)